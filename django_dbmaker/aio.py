@@ -0,0 +1,151 @@
+"""
+asyncio helpers running DBMaker work on a bounded thread pool per alias.
+
+Each worker thread holds its own Django connection (taken from the
+connection pool when OPTIONS['POOL'] is set), so concurrent coroutines run
+their queries in parallel instead of queueing on one thread:
+
+    from django_dbmaker import aio
+
+    rows = await aio.execute('SELECT COUNT(*) FROM t', using='default')
+    users = await aio.fetch(User.objects.filter(is_active=True))
+    async for row in aio.stream(Order.objects.all()):
+        ...
+
+The pool size is OPTIONS['async_workers'], by default the POOL 'max' or 4.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .registry import Registry
+
+# Worker threads don't survive a fork.
+_executors = Registry(clear_after_fork=True)
+_DONE = object()
+
+
+def get_executor(using=DEFAULT_DB_ALIAS):
+    """Return the thread pool running the database work of an alias."""
+    def create():
+        options = connections.databases[using].get('OPTIONS', {})
+        workers = options.get('async_workers') or (options.get('POOL') or {}).get('max', 4)
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dbmaker-%s' % using)
+    return _executors.get_or_create(using, create)
+
+
+def _call(using, func, args, kwargs):
+    # Runs in a worker thread: recycle its connection the way Django does
+    # around requests, which hands pooled connections back between calls.
+    connection = connections[using]
+    connection.close_if_unusable_or_obsolete()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        if connection.pool is not None and not connection.in_atomic_block:
+            connection.close()
+        else:
+            connection.close_if_unusable_or_obsolete()
+
+
+async def run(func, *args, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Run ``func(*args, **kwargs)`` on the alias' thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(using), _call, using, func, args, kwargs)
+
+
+def _execute(using, sql, params):
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        if cursor.description is None:
+            return cursor.rowcount
+        return cursor.fetchall()
+
+
+async def execute(sql, params=None, using=DEFAULT_DB_ALIAS):
+    """
+    Execute a statement and return its rows, or the row count for
+    statements without a result set.
+    """
+    return await run(_execute, using, sql, params, using=using)
+
+
+async def fetch(queryset):
+    """Evaluate a queryset on its database's thread pool."""
+    return await run(list, queryset, using=queryset.db)
+
+
+async def stream(queryset, chunk_size=2000, prefetch=2):
+    """
+    Iterate over a queryset's results without loading them all. Rows are
+    read with QuerySet.iterator() on a single worker thread and handed over
+    in batches of ``chunk_size``; at most ``prefetch`` batches wait in
+    memory before the worker blocks.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=prefetch)
+    stopped = threading.Event()
+
+    async def put(item):
+        # Nothing is queued once the consumer is gone.
+        if not stopped.is_set():
+            await queue.put(item)
+
+    def hand_over(item):
+        asyncio.run_coroutine_threadsafe(put(item), loop).result()
+
+    def produce():
+        iterator = queryset.iterator(chunk_size=chunk_size)
+        batch = []
+        try:
+            for item in iterator:
+                batch.append(item)
+                if len(batch) >= chunk_size:
+                    hand_over(batch)
+                    batch = []
+                    if stopped.is_set():
+                        return
+            if batch:
+                hand_over(batch)
+        except BaseException as e:
+            hand_over(e)
+            return
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+        hand_over(_DONE)
+
+    future = loop.run_in_executor(
+        get_executor(queryset.db), _call, queryset.db, produce, (), {})
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is _DONE:
+                break
+            if isinstance(batch, BaseException):
+                raise batch
+            for item in batch:
+                yield item
+    finally:
+        stopped.set()
+        # Make room for a batch the worker may be waiting to queue; later
+        # ones are dropped by put().
+        while not queue.empty():
+            queue.get_nowait()
+        try:
+            await asyncio.shield(future)
+        except Exception:
+            # Its errors went through the queue.
+            pass
+
+
+def shutdown(wait=True):
+    """Stop the thread pools of all aliases."""
+    with _executors.lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
@@ -45,11 +45,14 @@
 DBMaker database backend for Django.
 """
 import datetime
+import functools
+import itertools
 import logging
+import math
 import os
 import re
 import sys
-from time import time
+from time import monotonic, perf_counter, time
 import warnings
 
 from django.core.exceptions import ImproperlyConfigured
@@ -96,10 +99,68 @@ from django_dbmaker.creation import DatabaseCreation
 from django_dbmaker.introspection import DatabaseIntrospection
 from .schema import DatabaseSchemaEditor
 from .features import DatabaseFeatures
+from .cache import LRUCache
+from .querylog import QueryLog, QueryLogCursorWrapper
+from . import monitoring
+from . import slowlog
+from . import pool as connection_pool
+from . import replicas
+from .retry import RetryPolicy
+from . import timeouts
+from . import resultcache
+from . import prepared
 
 DatabaseError = Database.Error
 IntegrityError = Database.IntegrityError
 
+logger = logging.getLogger('django.db.backends')
+
+# Placeholders DBMaker can't type by itself. Statements still containing one
+# after compilation (raw SQL mostly) get their parameters inlined as literals.
+_UNTYPED_PARAM_RE = re.compile(r'(?:\bTHEN|\bELSE|\bLIKE)\s+%s|\(%s\) AS')
+
+# OPTIONS keys consumed by the backend itself; they must not reach
+# pyodbc.connect(), which would put them into the connection string.
+BACKEND_OPTIONS = (
+    'statement_cache_size',
+    'fast_executemany',
+    'fetch_buffer_size',
+    'POOL',
+    'session_batch',
+    'query_log',
+    'slow_query',
+    'async_workers',
+    'replicas',
+    'replica_check_interval',
+    'read_your_writes',
+    'retry',
+    'statement_timeout',
+    'charset',
+    'output_converters',
+    'result_cache',
+    'prepared_cursors',
+)
+
+
+def connect(conn_params, charset='utf-8', output_converters=None):
+    """
+    Open a pyodbc connection with explicit encodings, so the driver decodes
+    results itself: narrow (SQL_CHAR) data in ``charset``, wide data and
+    metadata in UTF-16LE; str parameters are sent as UTF-16LE.
+    ``output_converters`` maps pyodbc SQL type names to converters.
+    """
+    connection = Database.connect(**conn_params)
+    if hasattr(connection, 'setdecoding'):
+        connection.setdecoding(Database.SQL_CHAR, encoding=charset)
+        connection.setdecoding(Database.SQL_WCHAR, encoding='utf-16le')
+        if hasattr(Database, 'SQL_WMETADATA'):
+            connection.setdecoding(Database.SQL_WMETADATA, encoding='utf-16le')
+        connection.setencoding(encoding='utf-16le')
+    for sql_type, converter in (output_converters or {}).items():
+        connection.add_output_converter(getattr(Database, sql_type), converter)
+    return connection
+
+
 class DatabaseWrapper(BaseDatabaseWrapper):
     vendor = 'dbmaker'
     display_name = 'dbmaker'
@@ -111,7 +172,6 @@ class DatabaseWrapper(BaseDatabaseWrapper):
     Database = Database
     limit_table_list = False
     is_dbmaker = True
-    force_debug_cursor = True
 
     # Collations:       http://msdn2.microsoft.com/en-us/library/ms184391.aspx
     #                   http://msdn2.microsoft.com/en-us/library/ms179886.aspx
@@ -169,25 +229,27 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         'exact': '= %s',
         'iexact': '= upper(%s)',
         #'iexact': "= (%s)",
-        'contains': "LIKE %s ESCAPE '\\'",
-        'icontains': "LIKE %s ESCAPE '\\'",
+        # LIKE patterns are bound with an explicit type so the statement can
+        # stay parameterized, see DatabaseOperations.cast_char_param.
+        'contains': "LIKE CAST(%s AS NVARCHAR(2000)) ESCAPE '\\'",
+        'icontains': "LIKE CAST(%s AS NVARCHAR(2000)) ESCAPE '\\'",
         #'icontains': "LIKE UPPER(%s) ESCAPE '\\'",
         'gt': '> %s',
         'gte': '>= %s',
         'lt': '< %s',
         'lte': '<= %s',
-        'startswith': "LIKE %s ESCAPE '\\'",
-        'endswith': "LIKE %s ESCAPE '\\'",
-        'istartswith': "LIKE %s ESCAPE '\\'",
-        'iendswith': "LIKE %s ESCAPE '\\'",
+        'startswith': "LIKE CAST(%s AS NVARCHAR(2000)) ESCAPE '\\'",
+        'endswith': "LIKE CAST(%s AS NVARCHAR(2000)) ESCAPE '\\'",
+        'istartswith': "LIKE CAST(%s AS NVARCHAR(2000)) ESCAPE '\\'",
+        'iendswith': "LIKE CAST(%s AS NVARCHAR(2000)) ESCAPE '\\'",
         #'istartswith': "LIKE UPPER(%s) ESCAPE '\\'",
         #'iendswith': "LIKE UPPER(%s) ESCAPE '\\'",
 
         # TODO: remove, keep native T-SQL LIKE wildcards support
         # or use a "compatibility layer" and replace '*' with '%'
         # and '.' with '_'
-        'regex': 'LIKE %s',
-        'iregex': 'LIKE %s',
+        'regex': 'LIKE CAST(%s AS NVARCHAR(2000))',
+        'iregex': 'LIKE CAST(%s AS NVARCHAR(2000))',
 
         # TODO: freetext, full-text contains...
     }
@@ -217,6 +279,54 @@ class DatabaseWrapper(BaseDatabaseWrapper):
     def __init__(self, *args, **kwargs):
         super(DatabaseWrapper, self).__init__(*args, **kwargs)
         self.test_create = self.settings_dict.get('TEST_CREATE', True)
+        options = self.settings_dict.get('OPTIONS', {})
+        # Translated statements, keyed by (Django SQL, number of params).
+        self.statement_cache = LRUCache(options.get('statement_cache_size', 500))
+        self.fast_executemany = options.get('fast_executemany', False)
+        # Approximate bytes fetched per batch by chunked (iterator) reads.
+        self.fetch_buffer_size = options.get('fetch_buffer_size', 4 * 1024 * 1024)
+        self.pool = None
+        self._session_statements = None
+        # Send the session setup as one batch until the driver refuses it.
+        self.session_batch = options.get('session_batch', True)
+        self.query_log = QueryLog(**options.get('query_log', {}))
+        if self.query_log.enabled:
+            self.queries_log = self.query_log.entries
+        self.slow_query_log = None
+        if options.get('slow_query') is not None:
+            self.slow_query_log = slowlog.SlowQueryLog(self.alias, **options['slow_query'])
+        self.replica_set = None
+        if options.get('replicas'):
+            self.replica_set = replicas.get_replica_set(
+                self.alias, options['replicas'], options.get('replica_check_interval', 30))
+        self.replica = None
+        self.replica_connection = None
+        self._replica_pool = None
+        # Send reads to the primary once this connection has written, until
+        # it's recycled, see close_if_unusable_or_obsolete().
+        self.read_your_writes = options.get('read_your_writes', False)
+        self.replica_pinned = False
+        # Whether the next read may leave the current replica for a less
+        # loaded one, see choose_replica().
+        self.replica_rebalance = False
+        self.retry_policy = None
+        if options.get('retry') is not None:
+            self.retry_policy = RetryPolicy(**options['retry'])
+        # Seconds, None for no limit; see django_dbmaker.timeouts.
+        self.statement_timeout = options.get('statement_timeout')
+        self.timeout_override = None
+        self.query_deadline = None
+        self.result_cache = None
+        if options.get('result_cache') is not None:
+            self.result_cache = resultcache.get_result_cache(self.alias, options['result_cache'])
+        # Idle cursors kept prepared for the statement they last ran.
+        self.cursor_pool = None
+        if options.get('prepared_cursors'):
+            self.cursor_pool = prepared.CursorPool(options['prepared_cursors'])
+        if self.fast_executemany and pyodbc_ver < (4, 0, 19, 9999):
+            raise ImproperlyConfigured(
+                "OPTIONS['fast_executemany'] requires pyodbc 4.0.19 or newer; "
+                "you have %s" % Database.version)
 
     def get_connection_params(self):
         settings_dict = self.settings_dict
@@ -240,6 +350,8 @@ class DatabaseWrapper(BaseDatabaseWrapper):
             #**settings_dict['OPTIONS'],
         }
         conn_params.update(settings_dict['OPTIONS'])
+        for option in BACKEND_OPTIONS:
+            conn_params.pop(option, None)
 
         if settings_dict['USER']:
             conn_params['user'] = settings_dict['USER']
@@ -251,26 +363,167 @@ class DatabaseWrapper(BaseDatabaseWrapper):
             conn_params['port'] = settings_dict['PORT']
         return conn_params
 
+    def connect_function(self, conn_params):
+        """Return a callable opening a pyodbc connection with conn_params."""
+        options = self.settings_dict['OPTIONS']
+        return functools.partial(connect, conn_params, options.get('charset', 'utf-8'),
+                                 options.get('output_converters'))
+
     def get_new_connection(self, conn_params):
-        connection = Database.connect(**conn_params)
-        return connection
+        pool_options = self.settings_dict['OPTIONS'].get('POOL')
+        if pool_options is not None:
+            key = (self.alias, tuple(sorted(conn_params.items())))
+            self.pool = connection_pool.get_pool(
+                key, self.connect_function(conn_params), pool_options)
+            return self.pool.acquire()
+        return self.connect_function(conn_params)()
+
+    def close_if_unusable_or_obsolete(self):
+        # Called between requests, Celery tasks and aio calls alike: the
+        # end of read-your-writes stickiness.
+        self.replica_pinned = False
+        # Switching replicas means reconnecting without a pool: then keep
+        # the current one while it's healthy.
+        self.replica_rebalance = self._replica_pool is not None
+        super(DatabaseWrapper, self).close_if_unusable_or_obsolete()
+
+    def _close(self):
+        self.replica_pinned = False
+        self.close_replica()
+        if self.cursor_pool is not None:
+            self.cursor_pool.clear()
+        if self.pool is not None and self.connection is not None:
+            # A connection closed inside an atomic block stays referenced by
+            # this wrapper until the block exits, so it can't be shared.
+            with self.wrap_database_errors:
+                return self.pool.release(self.connection, discard=self.in_atomic_block)
+        return super(DatabaseWrapper, self)._close()
+
+    def session_statements(self):
+        """
+        Return the statements setting up a new session, computed once from
+        OPTIONS. The tuple doubles as the session fingerprint.
+        """
+        if self._session_statements is None:
+            statements = [
+                "set string concat on",
+                "set free catalog cache on",
+                "SET TRANSACTION ISOLATION LEVEL READ COMMITTED",
+                "set itcmd on",
+            ]
+            options = self.settings_dict['OPTIONS']
+            if options.get('SELTMPBB') == True:
+                statements.append("call SETSYSTEMOPTION(\'SELTMPBB\', \'1\')")
+                statements.append("SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED")
+            self._session_statements = tuple(statements)
+        return self._session_statements
 
     def init_connection_state(self):
-        cursor = self.create_cursor()
-        cursor.execute("set string concat on")
-        cursor.execute("set free catalog cache on")
-        cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
-        cursor.execute("set itcmd on")
-        options = self.settings_dict['OPTIONS']
-        if 'SELTMPBB' in options:
-           seltmpbb=options['SELTMPBB']
-           if(seltmpbb == True):
-              cursor.execute("call SETSYSTEMOPTION(\'SELTMPBB\', \'1\')")
-              cursor.execute("SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED")
-        cursor.close()
-        if not self.get_autocommit():
+        if self.cursor_pool is not None and not prepared.keeps_prepared(self.connection):
+            warnings.warn(
+                "OPTIONS['prepared_cursors'] is ignored, the driver drops prepared "
+                "statements at the end of transactions.", RuntimeWarning)
+            self.cursor_pool = None
+        if self.init_session(self.connection, self.pool) and not self.get_autocommit():
             self.commit()
 
+    def init_session(self, connection, pool=None):
+        """
+        Run the session setup statements on a pyodbc connection unless it
+        comes from ``pool`` with the same settings already applied. Return
+        whether they were run.
+        """
+        statements = self.session_statements()
+        if pool is not None and pool.session_fingerprint(connection) == statements:
+            # A pooled connection keeps its session settings.
+            return False
+        cursor = connection.cursor()
+        try:
+            if self.session_batch:
+                try:
+                    cursor.execute(';'.join(statements))
+                except Database.Error:
+                    # The driver doesn't take batches; the statements are
+                    # idempotent so they can simply be replayed one by one.
+                    self.session_batch = False
+            if not self.session_batch:
+                for sql in statements:
+                    cursor.execute(sql)
+        finally:
+            cursor.close()
+        if pool is not None:
+            pool.set_session_fingerprint(connection, statements)
+        return True
+
+    def choose_replica(self):
+        """
+        Return the replica the next read goes to, or None if all are down:
+        the current one while it's healthy, unless a rebalance is due and
+        another is less loaded.
+        """
+        current = self.replica if self.replica_connection is not None else None
+        if current is not None and not self.replica_rebalance and self.replica_set.is_healthy(current):
+            return current
+        self.replica_rebalance = False
+        return self.replica_set.choose(current)
+
+    def get_replica_connection(self, replica):
+        """
+        Return the pyodbc connection to ``replica``, from choose_replica(),
+        leaving the current replica if it's another one. Replicas failing to
+        connect are replaced by the next best. Return None when no replica
+        can be reached, reads then stay on the primary.
+        """
+        if replica is not None and replica is self.replica and self.replica_connection is not None:
+            return self.replica_connection
+        self.close_replica()
+        params = self.get_connection_params()
+        pool_options = self.settings_dict['OPTIONS'].get('POOL')
+        while True:
+            if replica is None:
+                return None
+            conn_params = replica.conn_params(params)
+            pool = connection = None
+            try:
+                if pool_options is not None:
+                    pool = connection_pool.get_pool(
+                        (self.alias, tuple(sorted(conn_params.items()))),
+                        self.connect_function(conn_params), pool_options)
+                    connection = pool.acquire()
+                else:
+                    connection = self.connect_function(conn_params)()
+                connection.autocommit = True
+                self.init_session(connection, pool)
+            except connection_pool.PoolTimeout:
+                # Busy, not broken.
+                return None
+            except Database.Error as e:
+                logger.warning('Replica %s of %r is unavailable: %s', replica.name, self.alias, e)
+                self.replica_set.mark_down(replica)
+                if connection is not None:
+                    self._release_replica(connection, pool, discard=True)
+                replica = self.replica_set.choose()
+                continue
+            self.replica_set.mark_up(replica)
+            self.replica, self.replica_connection, self._replica_pool = replica, connection, pool
+            return connection
+
+    def _release_replica(self, connection, pool, discard=False):
+        try:
+            if pool is not None:
+                pool.release(connection, discard=discard)
+            else:
+                connection.close()
+        except Database.Error:
+            pass
+
+    def close_replica(self, discard=False):
+        """Close the replica connection, or hand it back to its pool."""
+        connection, self.replica_connection = self.replica_connection, None
+        if connection is not None:
+            self._release_replica(connection, self._replica_pool, discard)
+        self.replica = self._replica_pool = None
+
     def _set_autocommit(self, autocommit):
         with self.wrap_database_errors:
             self.connection.autocommit = autocommit
@@ -317,8 +570,67 @@ class DatabaseWrapper(BaseDatabaseWrapper):
         connectionstring = ';'.join(cstr_parts)
         return connectionstring
 
+    def effective_timeout(self):
+        """
+        Return the timeout of the next statement in seconds, 0 for none,
+        from OPTIONS, statement_timeout() and the time left to the current
+        deadline().
+        """
+        timeout = self.statement_timeout if self.timeout_override is None else self.timeout_override
+        if self.query_deadline is not None:
+            remaining = self.query_deadline - monotonic()
+            if remaining <= 0:
+                raise timeouts.QueryTimeout('HYT00', 'Query deadline exceeded.')
+            timeout = min(timeout, remaining) if timeout else remaining
+        return timeout or 0
+
+    def apply_timeout(self, connection):
+        """
+        Set the driver timeout of the cursors next created on a pyodbc
+        connection, in whole seconds.
+        """
+        timeout = int(math.ceil(self.effective_timeout()))
+        if connection.timeout != timeout:
+            connection.timeout = timeout
+
+    def new_cursor(self):
+        """Return a new pyodbc cursor on the primary connection."""
+        self.apply_timeout(self.connection)
+        cursor = self.connection.cursor()
+        if self.fast_executemany:
+            cursor.fast_executemany = True
+        return cursor
+
     def create_cursor(self, name=None):
-        return CursorWrapper(self.connection.cursor(), self)
+        if self.cursor_pool is not None and name is None:
+            # Picked from the pool for each statement, see
+            # CursorWrapper.prepared_cursor(), or created on first use.
+            return CursorWrapper(None, self)
+        return CursorWrapper(self.new_cursor(), self, chunked=name is not None)
+
+    def prepare(self, sql):
+        """
+        Return a PreparedStatement running ``sql``, in Django's '%s' format,
+        on a cursor of its own so that it's prepared only once.
+        """
+        return prepared.PreparedStatement(self, sql)
+
+    @property
+    def queries(self):
+        # A full ring buffer is the expected state, don't warn about it.
+        if self.query_log.enabled:
+            return self.query_log.queries(self.ops)
+        return super(DatabaseWrapper, self).queries
+
+    def make_cursor(self, cursor):
+        if self.query_log.enabled:
+            return QueryLogCursorWrapper(cursor, self)
+        return super(DatabaseWrapper, self).make_cursor(cursor)
+
+    def chunked_cursor(self):
+        # QuerySet.iterator() gets a dedicated forward-only cursor which
+        # streams the result set in batches sized by the row width.
+        return self._cursor(name='chunked')
 
     def _execute_foreach(self, sql, table_names=None):
         cursor = self.cursor()
@@ -360,19 +672,189 @@ class CursorWrapper(object):
     A wrapper around the pyodbc's cursor that takes in account a) some pyodbc
     DB-API 2.0 implementation and b) some common ODBC driver particularities.
     """
-    def __init__(self, cursor, connection):
+    # Assumed size of a value of unknown or unbounded (LOB) width, and the
+    # per-value overhead of the Python objects built by pyodbc.
+    max_column_width = 8192
+    column_overhead = 32
+    # Rows bound per pyodbc executemany() call, so that parameters given as
+    # an iterator are never all held in memory.
+    executemany_chunk_size = 10000
+
+    def __init__(self, cursor, connection, chunked=False):
         self.active = True
-        self.cursor = cursor
+        # None until a statement runs with a cursor pool, see the cursor
+        # property.
+        self._cursor = self.primary_cursor = cursor
         self.connection = connection
+        # (replica connection, cursor) reads are routed to, and whether this
+        # cursor wrote, after which it stays on the primary.
+        self._replica_cursor = None
+        self.wrote = False
+        # (pyodbc connection, CursorPool key) of a primary_cursor taken from
+        # the connection's cursor pool.
+        self._pooled = None
+        self.chunked = chunked
         self.last_sql = ''
         self.last_params = ()
+        self.input_sizes = None
+        self.adapters = None
+        # Rows affected by the last executemany(), over all its chunks.
+        self._rowcount = None
+        self._chunk_rows = None
+        self._decoder = None
+        # QueryEvent of the current statement while observers are registered.
+        self._query = None
+
+    @property
+    def cursor(self):
+        """The pyodbc cursor of the last statement."""
+        if self._cursor is None:
+            # Nothing ran yet: a fresh cursor of our own, so that fetch*()
+            # raise the driver's errors and catalog calls work.
+            self._cursor = self.primary_cursor = self.connection.new_cursor()
+        return self._cursor
+
+    @cursor.setter
+    def cursor(self, cursor):
+        self._cursor = cursor
 
     def close(self):
+        self.finish_query()
         try:
-            self.cursor.close()
+            if self._pooled is not None:
+                pooled, self._pooled = self._pooled, None
+                cursor, self.primary_cursor = self.primary_cursor, None
+                self.connection.cursor_pool.put(pooled[0], pooled[1], cursor)
+            elif self.primary_cursor is not None:
+                self.primary_cursor.close()
+            if self._replica_cursor is not None:
+                self._replica_cursor[1].close()
         except Database.ProgrammingError:
             pass
 
+    def route(self, sql):
+        """
+        Return the pyodbc cursor to run ``sql`` on: a replica's for reads
+        outside of transactions, the primary's otherwise.
+        """
+        connection = self.connection
+        if connection.replica_set is None:
+            return self.primary_cursor
+        if not replicas.is_read(sql):
+            # e.g. "SELECT LAST_SERIAL" after an INSERT must see this session.
+            self.wrote = True
+            if connection.read_your_writes:
+                connection.replica_pinned = True
+            return self.primary_cursor
+        if (self.wrote or connection.replica_pinned or connection.in_atomic_block or
+                not connection.autocommit):
+            return self.primary_cursor
+        replica = connection.choose_replica()
+        if self._replica_cursor is not None and (
+                replica is None or self._replica_cursor[0] is not connection.replica_connection or
+                replica is not connection.replica):
+            # Close it before its connection is handed back.
+            self.close_replica_cursor()
+        replica_connection = connection.get_replica_connection(replica)
+        if replica_connection is None:
+            return self.primary_cursor
+        if self._replica_cursor is None or self._replica_cursor[0] is not replica_connection:
+            connection.apply_timeout(replica_connection)
+            self._replica_cursor = (replica_connection, replica_connection.cursor())
+            if connection.fast_executemany:
+                self._replica_cursor[1].fast_executemany = True
+        return self._replica_cursor[1]
+
+    def close_replica_cursor(self):
+        replica_cursor, self._replica_cursor = self._replica_cursor, None
+        try:
+            replica_cursor[1].close()
+        except Database.Error:
+            pass
+
+    def prepared_cursor(self, sql, inline=False):
+        """
+        Return the primary pyodbc cursor to run ``sql`` (translated) on. With
+        a cursor pool, it's one that already prepared ``sql`` if available,
+        and the current one goes back to the pool. Statements with ``inline``
+        literals are unique to their values, they run outside of the pool.
+        """
+        cursor_pool = self.connection.cursor_pool
+        if cursor_pool is None or self.chunked:
+            return self.primary_cursor
+        connection = self.connection
+        if inline:
+            if self._pooled is not None:
+                cursor_pool.put(self._pooled[0], self._pooled[1], self.primary_cursor)
+                self.primary_cursor = self._pooled = None
+            if self.primary_cursor is None:
+                self.primary_cursor = connection.new_cursor()
+            return self.primary_cursor
+        raw = connection.connection
+        # Cursors keep the timeout they were created with.
+        connection.apply_timeout(raw)
+        pooled = (raw, (sql, raw.timeout))
+        if pooled == self._pooled:
+            return self.primary_cursor
+        if self._pooled is not None:
+            cursor_pool.put(self._pooled[0], self._pooled[1], self.primary_cursor)
+        elif self.primary_cursor is not None:
+            # Not from the pool, see inline above.
+            self.primary_cursor.close()
+        cursor = cursor_pool.take(raw, pooled[1])
+        if cursor is None:
+            cursor = connection.new_cursor()
+        self.primary_cursor, self._pooled = cursor, pooled
+        return cursor
+
+    def run(self, cursor, method, sql, args):
+        """
+        Call a pyodbc cursor method, cancelling it from the watchdog thread
+        if it outlives the connection's deadline.
+        """
+        deadline = self.connection.query_deadline
+        if deadline is None:
+            return getattr(cursor, method)(sql, *args)
+        entry = timeouts.watchdog.watch(cursor, deadline)
+        try:
+            return getattr(cursor, method)(sql, *args)
+        finally:
+            timeouts.watchdog.unwatch(entry)
+
+    def execute_routed(self, sql, args, route_sql, inline=False):
+        cursor = self.route(route_sql)
+        if cursor is self.primary_cursor:
+            self.cursor = cursor = self.prepared_cursor(sql, inline)
+            return self.run(cursor, 'execute', sql, args)
+        connection = self.connection
+        replica_set, replica = connection.replica_set, connection.replica
+        replica_set.begin(replica)
+        try:
+            result = self.run(cursor, 'execute', sql, args)
+        except Database.Error as e:
+            if not replicas.is_connection_error(e):
+                raise
+            logger.warning('Replica %s of %r failed, retrying on the primary: %s',
+                           replica.name, connection.alias, e)
+            replica_set.mark_down(replica)
+            connection.close_replica(discard=True)
+            self._replica_cursor = None
+            self.cursor = self.prepared_cursor(sql, inline)
+            return self.run(self.cursor, 'execute', sql, args)
+        finally:
+            replica_set.end(replica)
+        self.cursor = cursor
+        return result
+
+    def finish_query(self):
+        """Report the current statement to the monitoring observers."""
+        query, self._query = self._query, None
+        if query is not None:
+            monitoring.emit(query)
+            slow_query_log = self.connection.slow_query_log
+            if slow_query_log is not None and query.total_time >= slow_query_log.threshold:
+                slow_query_log.record(self.connection, query, self)
+
     def format_sql(self, sql, n_params=None):
         # pyodbc uses '?' instead of '%s' as parameter placeholder.
         if n_params is not None:
@@ -401,6 +883,36 @@ class CursorWrapper(object):
                 fp.append(p)
         return tuple(fp)
     
+    def param_chunks(self, params_list, adapters=None):
+        """
+        Yield the rows of ``params_list``, any iterable, in lists of at most
+        executemany_chunk_size rows. With per-column ``adapters`` (None for
+        columns sent as they are), only those columns are converted; without,
+        every value goes through format_params().
+        """
+        chunk_size = self.executemany_chunk_size
+        if adapters is None:
+            rows = map(self.format_params, params_list)
+        else:
+            plan = [(i, adapt) for i, adapt in enumerate(adapters) if adapt is not None]
+            if not plan:
+                if isinstance(params_list, list) and len(params_list) <= chunk_size:
+                    yield params_list
+                    return
+                rows = iter(params_list)
+            else:
+                def adapt_row(row):
+                    row = list(row)
+                    for i, adapt in plan:
+                        row[i] = adapt(row[i])
+                    return row
+                rows = map(adapt_row, params_list)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
     def quote_value(self, value):
         if isinstance(value, (datetime.date, datetime.time, datetime.datetime)):
             return "cast('%s' as timestamp)" % value
@@ -415,94 +927,323 @@ class CursorWrapper(object):
         else:
             return str(value)
 
-    def execute(self, sql, params=()):       
+    def translate_sql(self, sql, n_params):
+        """
+        Return ``(odbc_sql, inline, fingerprint)`` for a statement generated
+        by Django. ``inline`` tells whether the parameters have to be
+        interpolated as literals, in which case ``odbc_sql`` is still in '%s'
+        format. Translations are memoized in the connection's statement cache.
+        """
+        cache = self.connection.statement_cache
+        key = (sql, n_params)
+        entry = cache.get(key)
+        if entry is None:
+            if _UNTYPED_PARAM_RE.search(sql):
+                entry = (sql, True, monitoring.fingerprint(sql))
+            else:
+                entry = (self.format_sql(sql, n_params).replace('%%', '%'), False,
+                         monitoring.fingerprint(sql))
+            cache.set(key, entry)
+        return entry
+
+    def cache_key(self, sql, params):
+        """
+        Return the result cache key and tables of a SELECT whose result may
+        be cached, else None.
+        """
+        connection = self.connection
+        if (self.wrote or connection.in_atomic_block or not connection.autocommit or
+                self.chunked or not replicas.is_read(sql)):
+            # Reads following a write on the same cursor (e.g. of LAST_SERIAL)
+            # may depend on it.
+            return None
+        tables = resultcache.referenced_tables(sql)
+        if not connection.result_cache.cacheable(tables):
+            return None
+        key = (sql, tuple(params) if params else ())
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key, tables
+
+    def execute_cached(self, sql, params):
+        """
+        Run a statement through the connection's result cache: answer
+        cacheable SELECTs from it, fill it with their results and evict what
+        writes touched.
+        """
+        result_cache = self.connection.result_cache
+        cacheable = None
+        if result_cache.check_versions(self.connection):
+            cacheable = self.cache_key(sql, params)
+        if cacheable is None:
+            result = self.execute(sql, params, cache=False)
+            if resultcache.writes(sql):
+                self.wrote = True
+                self.invalidate_cache(sql)
+            return result
+        key, tables = cacheable
+        cached = result_cache.get(key)
+        if cached is None:
+            generation = result_cache.generation(tables)
+            self.execute(sql, params, cache=False)
+            rows = self.fetchall()
+            if len(rows) <= result_cache.max_rows:
+                result_cache.set(key, tables, self.cursor.description, rows, generation)
+            cached = resultcache.CachedResult(self.cursor.description, rows)
+        self.last_sql = sql
+        self._rowcount = None
+        self._chunk_rows = None
+        self._decoder = None
+        self.cursor = cached
+        return cached
+
+    def invalidate_cache(self, sql):
+        """Evict the cached results of the tables written by ``sql``."""
+        if sql.lstrip()[:4].upper() == 'CALL':
+            # A procedure may have written anything.
+            tables = None
+        else:
+            tables = resultcache.referenced_tables(sql)
+            if not tables:
+                return
+        self.connection.result_cache.invalidate(self.connection, tables)
+
+    def execute(self, sql, params=(), cache=True):
+        if cache and self.connection.result_cache is not None:
+            return self.execute_cached(sql, params)
         self.last_sql = sql
-        if (('CASE WHEN' in sql) or
-            ( '(%s) AS' in sql) or
-            ('LIKE %s' in sql)) and params is not None:
+        self._rowcount = None
+        self._chunk_rows = None
+        self._decoder = None
+        observed = monitoring.observers or self.connection.slow_query_log is not None
+        if observed:
+            self.finish_query()
+            started = perf_counter()
+        if params is None:
+            params = ()
+        sql, inline, fingerprint = self.translate_sql(sql, len(params))
+        if inline:
             sql = sql % tuple(map(self.quote_value, params))
-            try:
-               return self.cursor.execute(sql)
-            except (IntegrityError, DatabaseError) as e:
-               esg = e.args[1]
-               logger = logging.getLogger('django.db.backends')
-               logger.error('DEBUG SQL')
-               logger.error("----------------------------------------------------------------------------")
-               logger.error(
-                '%s \n SQL: %s', esg, sql)
-               e = sys.exc_info()[1]
-               if '[23000]' in esg:
-                  raise utils.IntegrityError(*e.args)
-               else:
-                  raise utils.DatabaseError(*e.args)
+            args = ()
         else:
-            sql = self.format_sql(sql, len(params))
             params = self.format_params(params)
             self.last_params = params
-            sql = sql.replace('%%', '%')
+            args = (params,)
+        if observed:
+            bound = perf_counter()
+        retry_policy = self.connection.retry_policy
         try:
-           return self.cursor.execute(sql, params)
+            if (retry_policy is not None and self.connection.autocommit and
+                    not self.connection.in_atomic_block):
+                # A statement of its own is rolled back by the failure and
+                # can simply be sent again.
+                result = retry_policy.run(self.execute_routed, sql, args, self.last_sql, inline)
+            else:
+                result = self.execute_routed(sql, args, self.last_sql, inline)
         except (IntegrityError, DatabaseError) as e:
+            if observed:
+                self._query = monitoring.QueryEvent(
+                    self.connection.alias, fingerprint, self.last_sql, params,
+                    bind_time=bound - started, execute_time=perf_counter() - bound,
+                    error=type(e))
+                self.finish_query()
             esg = e.args[1]
             logger = logging.getLogger('django.db.backends')
             logger.error('DEBUG SQL')
             logger.error("----------------------------------------------------------------------------")
             logger.error(
                 '%s \n SQL: %s', esg, sql)
-            logger.error(params)
+            if not inline:
+                logger.error(params)
             e = sys.exc_info()[1]
+            if timeouts.is_timeout(e):
+                raise timeouts.QueryTimeout(*e.args)
             if '[23000]' in esg:
                 raise utils.IntegrityError(*e.args)
             else:
                 raise utils.DatabaseError(*e.args)
+        if observed:
+            self._query = monitoring.QueryEvent(
+                self.connection.alias, fingerprint, self.last_sql, params,
+                bind_time=bound - started, execute_time=perf_counter() - bound,
+                rowcount=self.cursor.rowcount)
+            if self.cursor.description is None:
+                self.finish_query()
+        return result
         
+    def setinputsizes(self, sizes):
+        """
+        Declare the parameter types of the next executemany() call, as a
+        sequence of pyodbc (sql_type, column_size, decimal_digits) entries.
+        """
+        self.input_sizes = sizes
+
+    def setadapters(self, adapters):
+        """
+        Declare how the rows of the next executemany() call are adapted: a
+        callable per column, None for columns sent as they are, e.g. built
+        with DatabaseOperations.param_adapter() from the model fields.
+        """
+        self.adapters = adapters
+
     def executemany(self, sql, params_list):
+        observed = monitoring.observers or self.connection.slow_query_log is not None
+        if observed:
+            self.finish_query()
+            started = perf_counter()
+            raw_sql = sql
+        if self.connection.replica_set is not None:
+            self.route(sql)
         sql = self.format_sql(sql)
+        self.cursor = self.prepared_cursor(sql)
+        self._chunk_rows = None
+        self._decoder = None
+        self._rowcount = 0
+        input_sizes, self.input_sizes = self.input_sizes, None
+        adapters, self.adapters = self.adapters, None
+        chunks = self.param_chunks(params_list, adapters)
+        chunk = next(chunks, None)
         # pyodbc's cursor.executemany() doesn't support an empty param_list
-        if not params_list:
+        if chunk is None:
             if '?' in sql:
                 return
-        else:
-            raw_pll = params_list
-            params_list = [self.format_params(p) for p in raw_pll]
+            chunk = []
 
+        if input_sizes is not None:
+            self.cursor.setinputsizes(input_sizes)
+        if observed:
+            bound = perf_counter()
+            self._query = monitoring.QueryEvent(
+                self.connection.alias, monitoring.fingerprint(raw_sql), raw_sql,
+                many=True, bind_time=bound - started, rowcount=0)
         try:
-            return self.cursor.executemany(sql, params_list)
+            while chunk is not None:
+                result = self.run(self.cursor, 'executemany', sql, (chunk,))
+                rowcount = self.cursor.rowcount
+                if rowcount < 0 or self._rowcount < 0:
+                    # Unknown for a chunk, unknown for all.
+                    self._rowcount = -1
+                else:
+                    self._rowcount += rowcount
+                if observed:
+                    self._query.rowcount += len(chunk)
+                chunk = next(chunks, None)
         except IntegrityError:
             e = sys.exc_info()[1]
+            if observed:
+                self._query.error = type(e)
             raise utils.IntegrityError(*e.args)
         except DatabaseError:
             e = sys.exc_info()[1]
+            if observed:
+                self._query.error = type(e)
+            if timeouts.is_timeout(e):
+                raise timeouts.QueryTimeout(*e.args)
             raise utils.DatabaseError(*e.args)
+        finally:
+            if input_sizes is not None:
+                self.cursor.setinputsizes(None)
+            if observed:
+                self._query.execute_time = perf_counter() - bound
+                self.finish_query()
+        if self.connection.result_cache is not None:
+            self.invalidate_cache(sql)
+        return result
     
-    def format_results(self, rows):
-        """
-        Decode data coming from the database if needed and convert rows to tuples
-        (pyodbc Rows are not sliceable).
-        """
-        needs_utc = _DJANGO_VERSION >= 14 and settings.USE_TZ
-        if not (needs_utc):
-            return tuple(rows)
-        # FreeTDS (and other ODBC drivers?) don't support Unicode yet, so we
-        # need to decode UTF-8 data coming from the DB
-        fr = []
-        for row in rows:
-            if needs_utc and isinstance(row, datetime.datetime):
-                row = row.replace(tzinfo=timezone.utc)
-            fr.append(row)
-        return tuple(fr)
+    def row_decoder(self):
+        """
+        Return a callable converting a pyodbc Row of the current result set
+        into a tuple (pyodbc Rows are not sliceable), attaching UTC to naive
+        datetimes when USE_TZ is on. It is built once per result set from
+        cursor.description; plain ``tuple`` is returned when no column needs
+        converting.
+        """
+        if self._decoder is None:
+            tz_columns = ()
+            if settings.USE_TZ:
+                tz_columns = [
+                    i for i, column in enumerate(self.cursor.description or ())
+                    if column[1] is datetime.datetime
+                ]
+            if not tz_columns:
+                self._decoder = tuple
+            else:
+                utc = timezone.utc
+
+                def decode(row):
+                    values = list(row)
+                    for i in tz_columns:
+                        value = values[i]
+                        if value is not None:
+                            values[i] = value.replace(tzinfo=utc)
+                    return tuple(values)
+                self._decoder = decode
+        return self._decoder
 
     def fetchone(self):
+        query = self._query
+        if query is not None:
+            started = perf_counter()
         row = self.cursor.fetchone()
         if row is not None:
-            return self.format_results(row)
+            row = self.row_decoder()(row)
+        if query is not None:
+            query.fetch_time += perf_counter() - started
+            if row is None:
+                self.finish_query()
+            else:
+                query.fetched += 1
+        if row is not None:
+            return row
         return []
 
+    def chunk_rows(self, chunk):
+        """
+        Return how many rows of the current result set fit in the
+        connection's fetch buffer, capped at ``chunk``.
+        """
+        if self._chunk_rows is None:
+            width = 0
+            for column in self.cursor.description or ():
+                size = column[3]
+                if not size or size > self.max_column_width:
+                    size = self.max_column_width
+                width += size + self.column_overhead
+            self._chunk_rows = max(1, self.connection.fetch_buffer_size // max(width, 1))
+        return min(chunk, self._chunk_rows)
+
     def fetchmany(self, chunk):
-        return [self.format_results(row) for row in self.cursor.fetchmany(chunk)]
+        if self.chunked:
+            chunk = self.chunk_rows(chunk)
+        query = self._query
+        if query is None:
+            return list(map(self.row_decoder(), self.cursor.fetchmany(chunk)))
+        started = perf_counter()
+        rows = list(map(self.row_decoder(), self.cursor.fetchmany(chunk)))
+        query.fetch_time += perf_counter() - started
+        query.fetched += len(rows)
+        if len(rows) < chunk:
+            self.finish_query()
+        return rows
 
     def fetchall(self):
-        return [self.format_results(row) for row in self.cursor.fetchall()]
+        query = self._query
+        if query is None:
+            return list(map(self.row_decoder(), self.cursor.fetchall()))
+        started = perf_counter()
+        rows = list(map(self.row_decoder(), self.cursor.fetchall()))
+        query.fetch_time += perf_counter() - started
+        query.fetched += len(rows)
+        self.finish_query()
+        return rows
+
+    @property
+    def rowcount(self):
+        if self._rowcount is not None:
+            return self._rowcount
+        return self.cursor.rowcount
 
     def __getattr__(self, attr):
         if attr in self.__dict__:
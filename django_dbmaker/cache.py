@@ -0,0 +1,69 @@
+"""
+Bounded in-process caches used by the DBMaker backend.
+
+Instances are owned by a single DatabaseWrapper, and Django never shares a
+DatabaseWrapper between threads, so no locking is done here.
+"""
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A mapping holding at most ``maxsize`` entries. When full, the least
+    recently used entry is evicted and handed to ``on_evict(key, value)`` if
+    given. A ``maxsize`` of 0 disables caching altogether.
+    """
+    def __init__(self, maxsize=128, on_evict=None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+        data[key] = value
+        while len(data) > self.maxsize:
+            old_key, old_value = data.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(old_key, old_value)
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        data, self._data = self._data, OrderedDict()
+        if self.on_evict is not None:
+            for key, value in data.items():
+                self.on_evict(key, value)
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -40,13 +40,22 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import copy
 import re
+from itertools import groupby
+from operator import itemgetter
+from django.db import IntegrityError, transaction
 from django.db.models.sql import compiler, where
 from django.db.models.aggregates import Avg
-from django.db.models.expressions import OrderBy
+from django.db.models.expressions import Case, OrderBy, RawSQL, Value
+from django.db.models.functions import Cast
+from django.db.models.lookups import Exact, In, Lookup, PatternLookup, Regex
 import django
 import types
 
+from . import serials
+from .timeouts import statement_timeout
+
 def _as_sql_agv(self, compiler, connection):
     return self.as_sql(compiler, connection,  template='%(function)s(CAST(%(field)s AS FLOAT))')
 
@@ -58,6 +67,31 @@ def _as_sql_order_by(self, compiler, connection):
         template = 'CASE WHEN %(expression)s IS NULL THEN 0 ELSE 1 END, %(expression)s %(ordering)s'  
     return self.as_sql(compiler, connection, template=template)
 
+def _cast_param(sql, params, connection, output_field=None):
+    # Give a lone placeholder an explicit type so it can stay a bound
+    # parameter instead of being inlined by the cursor.
+    if sql == '%s' and len(params) == 1:
+        db_type = connection.ops.cast_param_type(params[0], output_field)
+        if db_type:
+            sql = 'CAST(%%s AS %s)' % db_type
+    return sql, params
+
+def _as_sql_value(self, compiler, connection):
+    sql, params = self.as_sql(compiler, connection)
+    return _cast_param(sql, params, connection, self._output_field_or_none)
+
+def _as_sql_pattern(self, compiler, connection):
+    sql, params = self.as_sql(compiler, connection)
+    ops = connection.ops
+    if any(isinstance(param, str) and len(param) > ops.cast_char_param_max_length for param in params):
+        # Longer than the cast of DatabaseWrapper.operators.
+        sql = sql.replace('AS %s)' % ops.cast_char_param, 'AS %s)' % ops.cast_long_char_param)
+    return sql, params
+
+def _as_sql_raw(self, compiler, connection):
+    sql, params = _cast_param(self.sql.strip(), self.params, connection)
+    return '(%s)' % sql, params
+
 class SQLCompiler(compiler.SQLCompiler):  
        
     def compile(self, node, select_format=False):
@@ -70,19 +104,336 @@ class SQLCompiler(compiler.SQLCompiler):
             as_dbmaker = _as_sql_agv
         elif isinstance(node, OrderBy):
             as_dbmaker = _as_sql_order_by
+        elif isinstance(node, Value):
+            as_dbmaker = _as_sql_value
+        elif type(node) is RawSQL:
+            as_dbmaker = _as_sql_raw
+        elif isinstance(node, (PatternLookup, Regex)):
+            as_dbmaker = _as_sql_pattern
         if as_dbmaker:
-            node = node.copy()
+            # Lookups aren't expressions, they have no copy().
+            node = copy.copy(node) if isinstance(node, Lookup) else node.copy()
             node.as_dbmaker = types.MethodType(as_dbmaker, node)
         return node
 
+    def execute_sql(self, *args, **kwargs):
+        # Timeout set with django_dbmaker.timeouts.with_timeout().
+        timeout = getattr(self.query, 'statement_timeout', None)
+        if timeout is None:
+            return super().execute_sql(*args, **kwargs)
+        with statement_timeout(timeout, using=self.using):
+            return super().execute_sql(*args, **kwargs)
+
 class SQLInsertCompiler(compiler.SQLInsertCompiler, SQLCompiler):
-   pass
+
+    # Keys given by assign_serials() to the objects being inserted.
+    assigned_ids = None
+
+    def execute_sql(self, return_id=False):
+        if self.assigned_ids is None:
+            self.assigned_ids = self.assign_serials() or ()
+        if self.query.ignore_conflicts or getattr(self.query, 'unique_fields', None):
+            return self.execute_on_conflict()
+        ids = self.assigned_ids
+        if ids:
+            self.assigned_ids = ()
+            self.execute_sql()
+            if return_id:
+                return ids if len(ids) > 1 else ids[0]
+            return
+        if (return_id or not self.connection.fast_executemany or
+                len(self.query.objs) < 2):
+            return super().execute_sql(return_id)
+        # Send runs of identical single-row INSERTs as one executemany(),
+        # which pyodbc binds as parameter arrays in fast_executemany mode.
+        fields = self.query.fields
+        values_sql = 'VALUES (%s)' % ', '.join(['%s'] * len(fields))
+        with self.connection.cursor() as cursor:
+            for sql, statements in groupby(self.as_sql(), key=itemgetter(0)):
+                param_rows = [params for _, params in statements]
+                if len(param_rows) == 1:
+                    cursor.execute(sql, param_rows[0])
+                    continue
+                if fields and sql.endswith(values_sql):
+                    ops = self.connection.ops
+                    cursor.setinputsizes([ops.input_size(f) for f in fields])
+                    cursor.setadapters([ops.param_adapter(f) for f in fields])
+                cursor.executemany(sql, param_rows)
+
+    def as_sql(self):
+        # bulk_create() only sizes batches with ops.bulk_batch_size() when
+        # no batch_size is given; split larger ones into statements within
+        # features.max_query_params and max_statement_length.
+        objs = self.query.objs
+        if self.return_id or not self.connection.features.has_bulk_insert:
+            return super().as_sql()
+        batch_size = self.connection.ops.bulk_batch_size(self.query.fields, objs)
+        if len(objs) <= batch_size:
+            return super().as_sql()
+        statements = []
+        try:
+            for start in range(0, len(objs), batch_size):
+                self.query.objs = objs[start:start + batch_size]
+                statements.extend(super().as_sql())
+        finally:
+            self.query.objs = objs
+        return statements
+
+    def assign_serials(self):
+        """
+        Give the objects of a model registered with django_dbmaker.serials
+        their primary keys and insert them explicitly. Return the keys, or
+        None if DBMaker assigns them.
+        """
+        opts = self.query.get_meta()
+        if opts.auto_field is None or opts.auto_field in self.query.fields:
+            return None
+        allocator = serials.get_allocator(self.query.model, self.connection.alias)
+        if allocator is None:
+            return None
+        ids = allocator.take(self.connection, len(self.query.objs))
+        for obj, pk in zip(self.query.objs, ids):
+            setattr(obj, opts.auto_field.attname, pk)
+        self.query.fields = [opts.auto_field] + list(self.query.fields)
+        return ids
+
+    def conflict_targets(self):
+        """
+        Return the lists of fields whose values can't be repeated in the
+        table: ``query.unique_fields`` for upserts, else the primary key and
+        unique constraints covered by the inserted fields.
+        """
+        unique_fields = getattr(self.query, 'unique_fields', None)
+        if unique_fields:
+            return [list(unique_fields)]
+        opts = self.query.get_meta()
+        fields = set(self.query.fields)
+        if self.assigned_ids:
+            # Just reserved, no row can hold them.
+            fields.discard(opts.auto_field)
+        targets = [[field] for field in opts.concrete_fields if field.unique and field in fields]
+        for names in opts.unique_together:
+            targets.append([opts.get_field(name) for name in names])
+        for constraint in opts.constraints:
+            if getattr(constraint, 'condition', True) is None:
+                targets.append([opts.get_field(name) for name in constraint.fields])
+        return [target for target in targets if fields.issuperset(target)]
+
+    def on_conflict_as_sql(self):
+        """
+        Return the statements of an upsert per object, as ``(update, insert,
+        exists)``: its UPDATE (None unless ``query.update_fields``), an
+        INSERT only adding a row if no row of the table conflicts with it on
+        a conflict_targets() set, and a SELECT of the conflicting rows (None
+        without targets), each as (sql, params). NULLs compare equal unless
+        features.ignores_nulls_in_unique_constraints.
+        """
+        ops = self.connection.ops
+        qn = ops.quote_name
+        opts = self.query.get_meta()
+        table = qn(opts.db_table)
+        fields = self.query.fields
+        columns = ', '.join(qn(f.column) for f in fields)
+        targets = self.conflict_targets()
+        update_fields = getattr(self.query, 'update_fields', None) or ()
+        ignores_nulls = self.connection.features.ignores_nulls_in_unique_constraints
+        statements = []
+        for obj in self.query.objs:
+            values = {
+                field: (value, self.field_as_sql(field, value))
+                for field, value in (
+                    (field, self.prepare_value(field, self.pre_save_val(field, obj)))
+                    for field in fields)
+            }
+            conditions, conflict_params = [], []
+            for target in targets:
+                if ignores_nulls and any(values[field][0] is None for field in target):
+                    # Can't conflict with any row.
+                    continue
+                terms = []
+                for field in target:
+                    value, (placeholder, params) = values[field]
+                    if value is None:
+                        terms.append('%s IS NULL' % qn(field.column))
+                    else:
+                        terms.append('%s = %s' % (qn(field.column), placeholder))
+                        conflict_params.extend(params)
+                conditions.append('(%s)' % ' AND '.join(terms))
+            conflict = ' OR '.join(conditions)
+            update = exists = None
+            if conflict:
+                exists = (ops.conflict_exists_sql(table, conflict), tuple(conflict_params))
+            if update_fields and conflict:
+                assignments, params = [], []
+                for field in update_fields:
+                    placeholder, field_params = values[field][1]
+                    assignments.append('%s = %s' % (qn(field.column), placeholder))
+                    params.extend(field_params)
+                update = (
+                    ops.update_conflicts_sql(table, ', '.join(assignments), conflict),
+                    tuple(params + conflict_params))
+            selected, params = [], []
+            for field in fields:
+                # Selected values have no column to get their type from.
+                placeholder, field_params = _cast_param(*values[field][1], self.connection, field)
+                selected.append(placeholder)
+                params.extend(field_params)
+            if conflict:
+                sql = ops.insert_unless_exists_sql(table, columns, ', '.join(selected), conflict)
+            else:
+                sql = '%s %s (%s) VALUES (%s)' % (
+                    ops.insert_statement(), table, columns, ', '.join(selected))
+            statements.append((update, (sql, tuple(params + conflict_params)), exists))
+        return statements
+
+    def execute_on_conflict(self):
+        # All the updates go first, so an object matching an existing row
+        # isn't inserted; one repeating the key of an earlier object of the
+        # batch is skipped.
+        statements = self.on_conflict_as_sql()
+        updates = [update for update, insert, exists in statements if update is not None]
+        with self.connection.cursor() as cursor:
+            for sql, rows in groupby(updates, key=itemgetter(0)):
+                self.execute_group(cursor, sql, [params for _, params in rows])
+            for sql, rows in groupby(statements, key=lambda statement: statement[1][0]):
+                rows = list(rows)
+                try:
+                    with transaction.atomic(using=self.using):
+                        self.execute_group(cursor, sql, [insert[1] for _, insert, _ in rows])
+                except IntegrityError:
+                    # A concurrent transaction inserted a conflicting row
+                    # after the statement checked for one.
+                    for update, insert, exists in rows:
+                        self.insert_or_update(cursor, update, insert, exists)
+            if self.assigned_ids:
+                self.discard_unused_serials(cursor)
+
+    def discard_unused_serials(self, cursor):
+        """
+        Clear the keys assign_serials() gave to objects which weren't
+        inserted, as they were skipped or updated a row instead.
+        """
+        opts = self.query.get_meta()
+        qn = self.connection.ops.quote_name
+        pk = qn(opts.auto_field.column)
+        size = self.connection.features.max_query_params
+        inserted = set()
+        for start in range(0, len(self.assigned_ids), size):
+            ids = self.assigned_ids[start:start + size]
+            cursor.execute('SELECT %s FROM %s WHERE %s IN (%s)' % (
+                pk, qn(opts.db_table), pk, ', '.join(['%s'] * len(ids))), ids)
+            inserted.update(row[0] for row in cursor.fetchall())
+        for obj in self.query.objs:
+            if getattr(obj, opts.auto_field.attname) not in inserted:
+                setattr(obj, opts.auto_field.attname, None)
+
+    def execute_group(self, cursor, sql, param_rows):
+        if len(param_rows) == 1:
+            cursor.execute(sql, param_rows[0])
+        else:
+            cursor.executemany(sql, param_rows)
+
+    def insert_or_update(self, cursor, update, insert, exists):
+        """
+        Run the INSERT of an object, or its UPDATE if the INSERT fails on or
+        skips a row conflicting with it. Failures that aren't conflicts are
+        raised.
+        """
+        try:
+            with transaction.atomic(using=self.using):
+                cursor.execute(*insert)
+                inserted = cursor.rowcount
+        except IntegrityError:
+            if exists is None:
+                raise
+            cursor.execute(*exists)
+            if not cursor.fetchone():
+                # e.g. a NOT NULL or foreign key constraint.
+                raise
+            if update is not None:
+                cursor.execute(*update)
+        else:
+            if update is not None and inserted == 0:
+                # Skipped: the conflicting row was committed before the
+                # INSERT checked for it.
+                cursor.execute(*update)
 
 class SQLDeleteCompiler(compiler.SQLDeleteCompiler, SQLCompiler):
     pass
 
 class SQLUpdateCompiler(compiler.SQLUpdateCompiler, SQLCompiler):
-    pass
+    # Run the batches of QuerySet.bulk_update() as one parameterized UPDATE
+    # per object through executemany(), instead of one CASE WHEN statement
+    # per batch, unique to its values.
+    executemany_bulk_updates = True
+
+    def execute_sql(self, result_type):
+        if self.executemany_bulk_updates:
+            bulk_update = self.bulk_update_rows()
+            if bulk_update is not None:
+                return self.execute_bulk_update(*bulk_update)
+        return super().execute_sql(result_type)
+
+    def bulk_update_rows(self):
+        """
+        Return ``(fields, rows)`` if the query is a batch of bulk_update():
+        each field set to a Case of When(pk=..., then=Value(...)), resolved
+        by add_update_values(), over the primary keys it's filtered on. Each row holds the fields' values of
+        an object followed by its primary key. Else return None.
+        """
+        query = self.query
+        if not query.values or query.related_updates or len(query.where.children) != 1:
+            return None
+        lookup = query.where.children[0]
+        pk_field = query.get_meta().pk
+        if query.where.negated or not self.is_pk_lookup(lookup, In):
+            return None
+        fields, values = [], {}
+        for field, model, case in query.values:
+            if isinstance(case, Cast):
+                case = case.get_source_expressions()[0]
+            if not isinstance(case, Case) or hasattr(field, 'get_placeholder'):
+                return None
+            fields.append(field)
+            for when in case.cases:
+                condition, value = when.condition, when.result
+                if (not isinstance(condition, where.WhereNode) or condition.negated or
+                        len(condition.children) != 1 or not isinstance(value, Value) or
+                        not self.is_pk_lookup(condition.children[0], Exact)):
+                    return None
+                values.setdefault(condition.children[0].rhs, []).append(value.value)
+        try:
+            if set(values) != set(lookup.rhs) or any(len(v) != len(fields) for v in values.values()):
+                return None
+        except TypeError:
+            # Unhashable values.
+            return None
+        connection = self.connection
+        rows = [
+            [field.get_db_prep_save(value, connection=connection) for field, value in zip(fields, field_values)] +
+            [pk_field.get_db_prep_value(pk, connection)]
+            for pk, field_values in values.items()
+        ]
+        return fields, rows
+
+    def is_pk_lookup(self, lookup, lookup_class):
+        return (type(lookup) is lookup_class and
+                getattr(lookup.lhs, 'target', None) is self.query.get_meta().pk)
+
+    def execute_bulk_update(self, fields, rows):
+        ops = self.connection.ops
+        qn = ops.quote_name
+        opts = self.query.get_meta()
+        sql = 'UPDATE %s SET %s WHERE %s = %%s' % (
+            qn(opts.db_table),
+            ', '.join('%s = %%s' % qn(field.column) for field in fields),
+            qn(opts.pk.column))
+        with self.connection.cursor() as cursor:
+            if self.connection.fast_executemany:
+                cursor.setinputsizes([ops.input_size(f) for f in fields + [opts.pk]])
+            cursor.setadapters([ops.param_adapter(f) for f in fields + [opts.pk]])
+            cursor.executemany(sql, rows)
+            return cursor.rowcount
 
 class SQLAggregateCompiler(compiler.SQLAggregateCompiler, SQLCompiler):
     pass
@@ -1,7 +1,8 @@
 from django.db.backends.base.features import BaseDatabaseFeatures
+from django.utils.functional import cached_property
 
 class DatabaseFeatures(BaseDatabaseFeatures):
-    can_use_chunked_reads = False
+    can_use_chunked_reads = True
     supports_microsecond_precision = False
     supports_regex_backreferencing = False
     supports_subqueries_in_group_by = False
@@ -9,7 +10,9 @@ class DatabaseFeatures(BaseDatabaseFeatures):
     allow_sliced_subqueries = False
     supports_paramstyle_pyformat = False
 
-    has_bulk_insert = False
+    # Limits of a single statement, used to size multi-row INSERT batches.
+    max_query_params = 2000
+    max_statement_length = 65536
     # DateTimeField doesn't support timezones, only DateTimeOffsetField
     has_zoneinfo_database = False
     supports_timezones = False
@@ -27,15 +30,28 @@ class DatabaseFeatures(BaseDatabaseFeatures):
     supports_select_difference = False
     update_can_self_select = False
     has_zoneinfo_database = False
-    supports_ignore_conflicts = False
+    supports_ignore_conflicts = True
     allow_sliced_subqueries_with_in = False
     nulls_order_largest = True
     supports_combined_alters = False
-    #has_select_for_update = True
-    #has_select_for_update_nowait = True
-    #has_select_for_update_of = True
+    has_select_for_update = True
+    # DBMaker has no NOWAIT clause; locked rows are waited for.
+    has_select_for_update_nowait = False
+    has_select_for_update_of = True
+    select_for_update_of_column = True
     #order_by_nulls_first = True
     # Does the backend support NULLS FIRST and NULLS LAST in ORDER BY?
     #supports_order_by_nulls_modifier = False
 #    case_whennot_not_supported = True
 
+    # Only LAST_SERIAL tells DBMaker's serials, one INSERT at a time. Models
+    # registered with django_dbmaker.serials get their keys from
+    # bulk_create() all the same, see SQLInsertCompiler.assign_serials().
+    can_return_ids_from_bulk_insert = False
+
+    @cached_property
+    def has_bulk_insert(self):
+        # With fast_executemany, single-row INSERTs bound as parameter arrays
+        # are cheaper than multi-row VALUES statements.
+        return not self.connection.fast_executemany
+
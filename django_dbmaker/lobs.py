@@ -0,0 +1,223 @@
+"""
+Streaming access to BLOB (BinaryField) and NCLOB (TextField) columns:
+
+    from django_dbmaker import lobs
+
+    with lobs.open_lob(document, 'content') as f:
+        shutil.copyfileobj(f, response)
+
+    with open(path, 'rb') as f:
+        lobs.write_lob(document, 'content', f)
+
+Values are transferred in slices of ``chunk_size`` bytes (characters for
+NCLOBs) with one statement each, so memory use doesn't depend on the size
+of the value. Readers take no lock: each slice also reads the length of the
+value, and a reader raises LOBChanged when it differs from the one its first
+slice saw, i.e. a concurrent write replaced the value. pyodbc can't stream a
+parameter from a file, so writes store the first slice and append the others
+to it, in one transaction. Each append rewrites the whole value: slices are
+appended in sizes doubling up to ``max_append_size``, keeping the work linear
+in the length of values up to that size.
+"""
+import io
+
+from django.db import connections, router, transaction
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_APPEND_SIZE = 32 * DEFAULT_CHUNK_SIZE
+
+LOB_CAST_TYPES = {
+    'BinaryField': 'BLOB',
+    'TextField': 'NCLOB',
+}
+
+
+class LOBChanged(IOError):
+    """The value being read was replaced by a concurrent write."""
+
+
+def _locate(instance, field_name, using, for_write=False):
+    model = type(instance)
+    field = model._meta.get_field(field_name)
+    internal_type = field.get_internal_type()
+    if internal_type not in LOB_CAST_TYPES:
+        raise ValueError("%s.%s is not a BinaryField or TextField." % (
+            model.__name__, field_name))
+    if using is None:
+        if for_write:
+            using = router.db_for_write(model, instance=instance)
+        else:
+            using = instance._state.db or router.db_for_read(model, instance=instance)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    return (connection, field, quote_name(model._meta.db_table), quote_name(field.column),
+            quote_name(model._meta.pk.column))
+
+
+class LOBSlices(object):
+    """Reads a LOB value by slices of ``chunk_size``."""
+    empty = b''
+
+    def __init__(self, connection, table, column, pk_column, pk, chunk_size=DEFAULT_CHUNK_SIZE,
+                 length_sql=None):
+        self.connection = connection
+        self.pk = pk
+        self.chunk_size = chunk_size
+        self.position = 0
+        # Length of the value when the first slice was read.
+        self._length = None
+        length_sql = (length_sql or connection.ops.lob_length_sql) % column
+        self._slice_sql = 'SELECT %s, %s FROM %s WHERE %s = %%s' % (
+            connection.ops.lob_slice_sql % column, length_sql, table, pk_column)
+        self._length_sql = 'SELECT %s FROM %s WHERE %s = %%s' % (length_sql, table, pk_column)
+
+    def _select(self, sql, params):
+        with self.connection.cursor() as cursor:
+            # The backend's cursor: Django's wrapper can't skip the result
+            # cache.
+            cursor.cursor.execute(sql, params, cache=False)
+            return cursor.fetchone()
+
+    def read_slice(self, size):
+        """Return up to ``size`` units from the current position on."""
+        if size <= 0:
+            return self.empty
+        row = self._select(self._slice_sql, [self.position + 1, size, self.pk])
+        if not row:
+            return self.empty
+        data, length = row[0] or self.empty, row[1] or 0
+        if self._length is None:
+            self._length = length
+        elif length != self._length:
+            raise LOBChanged("The value changed while it was read (length %d, now %d)." % (
+                self._length, length))
+        self.position += len(data)
+        return data
+
+    def chunks(self):
+        """Iterate over the rest of the value, a slice at a time."""
+        while True:
+            data = self.read_slice(self.chunk_size)
+            if data:
+                yield data
+            if len(data) < self.chunk_size:
+                return
+
+    def length(self):
+        row = self._select(self._length_sql, [self.pk])
+        return (row[0] if row else None) or 0
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.length()
+        self.position = max(offset, 0)
+        return self.position
+
+
+class BlobReader(LOBSlices, io.RawIOBase):
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.read_slice(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readall(self):
+        return b''.join(self.chunks())
+
+
+class ClobReader(LOBSlices, io.TextIOBase):
+    empty = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return ''.join(self.chunks())
+        return self.read_slice(size)
+
+
+def open_lob(instance, field_name, chunk_size=DEFAULT_CHUNK_SIZE, using=None):
+    """
+    Return a read-only file object over the value of a BinaryField
+    (binary, buffered by ``chunk_size`` bytes) or a TextField (text) of a
+    saved model instance.
+    """
+    connection, field, table, column, pk_column = _locate(instance, field_name, using)
+    if field.get_internal_type() == 'TextField':
+        return ClobReader(connection, table, column, pk_column, instance.pk, chunk_size,
+                          connection.ops.lob_char_length_sql)
+    return io.BufferedReader(
+        BlobReader(connection, table, column, pk_column, instance.pk, chunk_size), chunk_size)
+
+
+def _chunks(source, chunk_size):
+    if hasattr(source, 'read'):
+        while True:
+            data = source.read(chunk_size)
+            if not data:
+                return
+            yield data
+    else:
+        for data in source:
+            if data:
+                yield data
+
+
+def _slices(chunks, chunk_size, max_append_size):
+    # Appending rewrites the value: appending as much as it already holds
+    # each time makes the total work linear, at the cost of buffering up to
+    # max_append_size.
+    target = chunk_size
+    buffer, buffered, stored = [], 0, 0
+    for data in chunks:
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= target:
+            yield buffer[0][:0].join(buffer)
+            stored += buffered
+            buffer, buffered = [], 0
+            target = max(min(stored, max_append_size), chunk_size)
+    if buffer:
+        yield buffer[0][:0].join(buffer)
+
+
+def write_lob(instance, field_name, source, chunk_size=DEFAULT_CHUNK_SIZE, using=None,
+              max_append_size=DEFAULT_MAX_APPEND_SIZE):
+    """
+    Replace the value of a BinaryField or TextField of a saved model
+    instance with the content of ``source``, a file object or an iterable of
+    chunks, and return its length. The instance's attribute isn't updated.
+    Slices after the first one are appended in growing sizes, up to
+    ``max_append_size``.
+    """
+    connection, field, table, column, pk_column = _locate(instance, field_name, using, for_write=True)
+    binary = field.get_internal_type() == 'BinaryField'
+    set_sql = 'UPDATE %s SET %s = %%s WHERE %s = %%s' % (table, column, pk_column)
+    append_sql = 'UPDATE %s SET %s WHERE %s = %%s' % (
+        table,
+        connection.ops.lob_append_sql % {'column': column, 'type': LOB_CAST_TYPES[field.get_internal_type()]},
+        pk_column)
+    length = 0
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        sql = set_sql
+        chunks = _chunks(source, chunk_size)
+        if binary:
+            chunks = map(bytes, chunks)
+        for data in _slices(chunks, chunk_size, max_append_size):
+            cursor.execute(sql, [data, instance.pk])
+            sql = append_sql
+            length += len(data)
+        if not length:
+            cursor.execute(set_sql, [b'' if binary else '', instance.pk])
+    return length
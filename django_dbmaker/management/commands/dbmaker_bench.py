@@ -0,0 +1,187 @@
+"""
+dbmaker_bench management command: measures rows per second of the backend's
+bulk write paths against a scratch table.
+
+    python manage.py dbmaker_bench insert --rows 10000
+"""
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, models
+from django.utils import timezone
+
+
+class BenchRow(models.Model):
+    name = models.CharField(max_length=100)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    created = models.DateTimeField()
+    flag = models.BooleanField(default=False)
+
+    class Meta:
+        app_label = 'django_dbmaker'
+        db_table = 'dbmaker_bench_row'
+        managed = False
+
+
+def _make_rows(count):
+    now = timezone.now()
+    return [
+        BenchRow(name='row %d' % i, amount=Decimal(i) / 100, created=now)
+        for i in range(count)
+    ]
+
+
+def bench_insert(connection, rows):
+    """
+    bulk_create() with one INSERT per object (the pre-bulk-insert path)
+    against multi-row VALUES statements.
+    """
+    features = connection.features
+    has_bulk_insert = features.has_bulk_insert
+    manager = BenchRow.objects.db_manager(connection.alias)
+    results = []
+    try:
+        for label, bulk in (('single-row INSERT', False), ('multi-row INSERT', True)):
+            features.has_bulk_insert = bulk
+            objs = _make_rows(rows)
+            start = time.perf_counter()
+            manager.bulk_create(objs)
+            results.append((label, time.perf_counter() - start))
+            manager.all().delete()
+    finally:
+        features.has_bulk_insert = has_bulk_insert
+    return results
+
+
+def _param_rows(count):
+    # Raw values, as an ingest job would read them.
+    created = timezone.now()
+    for i in range(count):
+        yield ('row %d' % i, Decimal(i) / 100, created, i % 2 == 0)
+
+
+def _peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_executemany(connection, rows):
+    """
+    Rows adapted value by value (the ops adapters, then format_params()) and
+    materialized, sent with pyodbc's executemany() (the previous path),
+    against the cursor's executemany() consuming a generator in chunks with
+    a per-column adapter plan built from the model fields. The adaptation
+    alone is timed and its peak memory measured on separate lines.
+    """
+    ops = connection.ops
+    fields = [BenchRow._meta.get_field(name) for name in ('name', 'amount', 'created', 'flag')]
+    sql = 'INSERT INTO %s (%s) VALUES (%%s, %%s, %%s, %%s)' % (
+        ops.quote_name(BenchRow._meta.db_table),
+        ', '.join(ops.quote_name(f.column) for f in fields))
+    plan = [ops.param_adapter(f, prepared=False) for f in fields]
+    manager = BenchRow.objects.db_manager(connection.alias)
+    results = []
+    with connection.cursor() as cursor:
+        def materialized():
+            return [
+                cursor.format_params((
+                    name, ops.adapt_decimalfield_value(amount, 12, 2),
+                    ops.adapt_datetimefield_value(created), flag))
+                for name, amount, created, flag in list(_param_rows(rows))
+            ]
+
+        def planned():
+            for chunk in cursor.param_chunks(_param_rows(rows), plan):
+                pass
+
+        def raw_executemany():
+            # The raw pyodbc cursor, as before chunking.
+            raw = connection.connection.cursor()
+            raw.fast_executemany = connection.fast_executemany
+            try:
+                raw.executemany(cursor.format_sql(sql), materialized())
+            finally:
+                raw.close()
+
+        def planned_executemany():
+            cursor.setadapters(plan)
+            cursor.executemany(sql, _param_rows(rows))
+
+        for label, build, run in (
+                ('format_params', materialized, raw_executemany),
+                ('column plan', planned, planned_executemany)):
+            start = time.perf_counter()
+            build()
+            results.append((label + ', adapt only', time.perf_counter() - start, _peak_memory(build)))
+            start = time.perf_counter()
+            run()
+            results.append((label + ', executemany', time.perf_counter() - start))
+            manager.all().delete()
+    return results
+
+
+def bench_update(connection, rows):
+    """
+    bulk_update() with Django's CASE WHEN statement per batch against one
+    parameterized UPDATE per object sent through executemany().
+    """
+    update_compiler = connection.ops.compiler('SQLUpdateCompiler')
+    executemany_bulk_updates = update_compiler.executemany_bulk_updates
+    manager = BenchRow.objects.db_manager(connection.alias)
+    results = []
+    try:
+        for label, executemany in (('CASE WHEN UPDATE', False), ('executemany UPDATE', True)):
+            update_compiler.executemany_bulk_updates = executemany
+            # Both passes make the same changes to the same rows.
+            manager.all().delete()
+            manager.bulk_create(_make_rows(rows))
+            objs = list(manager.order_by('pk'))
+            for obj in objs:
+                obj.amount += 1
+                obj.flag = not obj.flag
+            start = time.perf_counter()
+            manager.bulk_update(objs, ['amount', 'flag'])
+            results.append((label, time.perf_counter() - start))
+    finally:
+        update_compiler.executemany_bulk_updates = executemany_bulk_updates
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks bulk operations of the DBMaker backend on a scratch table.'
+
+    benchmarks = {
+        'insert': bench_insert,
+        'executemany': bench_executemany,
+        'update': bench_update,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmark', choices=sorted(self.benchmarks))
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, benchmark, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'dbmaker':
+            raise CommandError("Database '%s' doesn't use the DBMaker backend." % connection.alias)
+        rows = options['rows']
+        with connection.schema_editor() as editor:
+            editor.create_model(BenchRow)
+        try:
+            results = self.benchmarks[benchmark](connection, rows)
+        finally:
+            with connection.schema_editor() as editor:
+                editor.delete_model(BenchRow)
+        for label, elapsed, *memory in results:
+            line = '%-28s %8d rows %9.3fs %12.0f rows/s' % (
+                label, rows, elapsed, rows / elapsed if elapsed else 0)
+            if memory:
+                line += ' %9.1f MiB peak' % (memory[0] / 1024 / 1024)
+            self.stdout.write(line)
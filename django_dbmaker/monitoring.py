@@ -0,0 +1,176 @@
+"""
+Query execution hooks.
+
+Observers are callables registered with ``register()``; the cursor hands
+each of them a QueryEvent once a statement is done (its results fetched,
+the cursor closed or another statement executed):
+
+    from django_dbmaker import monitoring
+
+    histogram = monitoring.LatencyHistogram()
+    monitoring.register(histogram)
+    ...
+    histogram.snapshot()
+
+Nothing is timed while no observer is registered.
+"""
+import logging
+import re
+import threading
+import zlib
+from bisect import bisect_left
+
+logger = logging.getLogger('django.db.backends')
+
+# Registered observers. Replaced, never mutated, so the cursor can read it
+# without locking.
+observers = ()
+_lock = threading.Lock()
+
+_in_list_re = re.compile(r'\bIN \(%s(?:, %s)*\)', re.IGNORECASE)
+_repeated_rows_re = re.compile(r'(\([^()]*\))(?:, \1)+')
+_whitespace_re = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """
+    Return ``sql`` with whitespace collapsed, IN lists of placeholders
+    and repeated multi-row VALUES groups reduced to a single entry.
+    """
+    sql = _whitespace_re.sub(' ', sql.strip())
+    sql = _in_list_re.sub('IN (...)', sql)
+    return _repeated_rows_re.sub(r'\1, ...', sql)
+
+
+def fingerprint(sql):
+    """Return a short stable identifier for the statement shape of ``sql``."""
+    return '%08x' % (zlib.crc32(normalize_sql(sql).encode('utf-8')) & 0xffffffff)
+
+
+def register(observer):
+    global observers
+    with _lock:
+        if observer not in observers:
+            observers = observers + (observer,)
+
+
+def unregister(observer):
+    global observers
+    with _lock:
+        observers = tuple(o for o in observers if o is not observer)
+
+
+class QueryEvent(object):
+    """
+    Timings of one statement, in seconds. ``rowcount`` is the number of
+    rows fetched for queries and the driver's row count otherwise;
+    ``error`` is the exception class if the statement failed.
+    """
+    __slots__ = ('alias', 'fingerprint', 'sql', 'params', 'many', 'bind_time',
+                 'execute_time', 'fetch_time', 'rowcount', 'fetched', 'error')
+
+    def __init__(self, alias, fingerprint, sql, params=None, many=False,
+                 bind_time=0.0, execute_time=0.0, rowcount=-1, error=None):
+        self.alias = alias
+        self.fingerprint = fingerprint
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.bind_time = bind_time
+        self.execute_time = execute_time
+        self.fetch_time = 0.0
+        self.rowcount = rowcount
+        self.fetched = 0
+        self.error = error
+
+    @property
+    def total_time(self):
+        return self.bind_time + self.execute_time + self.fetch_time
+
+    def __repr__(self):
+        return '<QueryEvent %s %s %.6fs rows=%s>' % (
+            self.alias, self.fingerprint, self.total_time, self.rowcount)
+
+
+def emit(event):
+    if event.rowcount < 0:
+        event.rowcount = event.fetched
+    for observer in observers:
+        try:
+            observer(event)
+        except Exception:
+            logger.exception('Query observer %r failed.', observer)
+
+
+class LatencyHistogram(object):
+    """
+    Observer aggregating total statement latency per fingerprint into
+    fixed buckets (upper bounds in seconds). At most ``max_fingerprints``
+    statements are tracked, later ones are counted under 'other'.
+    """
+    buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+               0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+    def __init__(self, max_fingerprints=1000):
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def __call__(self, event):
+        elapsed = event.total_time
+        key = event.fingerprint
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    key, sql = 'other', None
+                    stats = self._stats.get(key)
+                else:
+                    sql = event.sql
+                if stats is None:
+                    stats = self._stats[key] = {
+                        'sql': sql,
+                        'count': 0,
+                        'errors': 0,
+                        'rows': 0,
+                        'sum': 0.0,
+                        'max': 0.0,
+                        'counts': [0] * len(self.buckets),
+                    }
+            stats['count'] += 1
+            stats['rows'] += max(event.rowcount, 0)
+            stats['sum'] += elapsed
+            if elapsed > stats['max']:
+                stats['max'] = elapsed
+            if event.error is not None:
+                stats['errors'] += 1
+            stats['counts'][bisect_left(self.buckets, elapsed)] += 1
+
+    def snapshot(self):
+        """Return a copy of the statistics, keyed by fingerprint."""
+        with self._lock:
+            return {
+                key: dict(stats, counts=list(stats['counts']))
+                for key, stats in self._stats.items()
+            }
+
+    def percentile(self, fingerprint, q):
+        """
+        Return the upper bound of the bucket holding the ``q`` quantile
+        (0 < q <= 1) of a fingerprint's latencies, or None if unseen.
+        """
+        with self._lock:
+            stats = self._stats.get(fingerprint)
+            if stats is None or not stats['count']:
+                return None
+            rank = q * stats['count']
+            seen = 0
+            for bound, count in zip(self.buckets, stats['counts']):
+                seen += count
+                if seen >= rank:
+                    return min(bound, stats['max'])
+            return stats['max']
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
@@ -42,6 +42,8 @@
 
 import datetime
 import decimal
+import functools
+import re
 import time
 import uuid
 from _decimal import Decimal
@@ -55,13 +57,61 @@ except:
 
 from django.conf import settings
 from django.db.backends.base.operations import BaseDatabaseOperations
+from django.db.models.expressions import Col
 from django.db import utils
 from django.utils.dateparse import parse_date, parse_time, parse_datetime
 
 from django.utils import timezone
 
+_db_type_re = re.compile(r'^\s*(\w+)\s*(?:\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\))?')
+
+
+@functools.lru_cache(maxsize=None)
+def _decimal_rounding(max_digits, decimal_places):
+    # quantize() arguments rounding to a DecimalField's precision.
+    return Decimal(1).scaleb(-decimal_places), decimal.Context(prec=max_digits)
+
+
+def _bool_param(value):
+    # BooleanFields are int columns.
+    return value if value is None else int(value)
+
 class DatabaseOperations(BaseDatabaseOperations):
     compiler_module = "django_dbmaker.compiler"
+
+    # pyodbc SQL type constants for the column types of
+    # DatabaseWrapper.data_types, used to declare executemany() input sizes.
+    # LOBs are left out: they have no size to declare, pyodbc sizes them
+    # from the values.
+    input_size_types = {
+        'char': 'SQL_CHAR',
+        'varchar': 'SQL_VARCHAR',
+        'nchar': 'SQL_WCHAR',
+        'nvarchar': 'SQL_WVARCHAR',
+        'decimal': 'SQL_DECIMAL',
+        'numeric': 'SQL_NUMERIC',
+        'smallint': 'SQL_SMALLINT',
+        'int': 'SQL_INTEGER',
+        'integer': 'SQL_INTEGER',
+        'serial': 'SQL_INTEGER',
+        'bigint': 'SQL_BIGINT',
+        'bigserial': 'SQL_BIGINT',
+        'float': 'SQL_FLOAT',
+        'double': 'SQL_DOUBLE',
+        'date': 'SQL_TYPE_DATE',
+        'time': 'SQL_TYPE_TIME',
+        'timestamp': 'SQL_TYPE_TIMESTAMP',
+    }
+    # (column size, decimal digits) of the types without a declared size:
+    # datetimes keep their microseconds, times are bound to the second (see
+    # adapt_timefield_value()).
+    input_size_precisions = {
+        'date': (10, 0),
+        'time': (8, 0),
+        'timestamp': (26, 6),
+    }
+    # Types needing a declared size, left to pyodbc without one.
+    input_size_sized_types = frozenset(['char', 'varchar', 'nchar', 'nvarchar', 'decimal', 'numeric'])
         
     cast_char_field_without_max_length = 'VARCHAR(256)'
     cast_data_types = {
@@ -69,6 +119,23 @@ class DatabaseOperations(BaseDatabaseOperations):
         'BigAutoField': 'BIGINT',
         'TextField': cast_char_field_without_max_length,
     }
+    # Type given to bound string parameters whose column type is unknown,
+    # e.g. LIKE patterns. Keep in sync with DatabaseWrapper.operators.
+    # Longer strings are cast to cast_long_char_param.
+    cast_char_param = 'NVARCHAR(2000)'
+    cast_char_param_max_length = 2000
+    cast_long_char_param = 'NCLOB'
+    cast_param_types = (
+        (bool, 'INT'),
+        (int, 'BIGINT'),
+        (float, 'DOUBLE'),
+        (str, cast_char_param),
+        (datetime.datetime, 'TIMESTAMP'),
+        (datetime.date, 'DATE'),
+        (datetime.time, 'TIME'),
+        ((bytes, bytearray, memoryview), 'BLOB'),
+        (uuid.UUID, 'VARCHAR(36)'),
+    )
     def __init__(self, connection):
         super(DatabaseOperations, self).__init__(connection) 
         self.connection = connection
@@ -269,6 +336,128 @@ class DatabaseOperations(BaseDatabaseOperations):
             return 'CAST(%s as nvarchar)'
         return '%s'
 
+    def cast_param_type(self, value, output_field=None):
+        """
+        Return the DBMaker type used to wrap a bound parameter as
+        CAST(? AS <type>) where the server can't infer the parameter type
+        from its context (CASE results, select list, LIKE patterns). Returns
+        None when no explicit type can be determined.
+        """
+        if output_field is not None:
+            internal_type = output_field.get_internal_type()
+            if internal_type == 'TextField':
+                # cast_data_types would truncate to VARCHAR, keep NCLOB.
+                return output_field.db_type(self.connection)
+            if internal_type != 'CharField' or output_field.max_length is not None:
+                return output_field.cast_db_type(self.connection)
+            # Unsized, typed from the value as below rather than cut to
+            # cast_char_field_without_max_length.
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return self.cast_char_param_type(value)
+        if isinstance(value, Decimal):
+            if not value.is_finite():
+                raise ValueError("DBMaker backend does not support %s decimals." % value)
+            sign, digits, exponent = value.as_tuple()
+            scale = max(-exponent, 0)
+            precision = max(len(digits) + max(exponent, 0), scale, 1)
+            return 'DECIMAL(%d, %d)' % (precision, scale)
+        for types, db_type in self.cast_param_types:
+            if isinstance(value, types):
+                return db_type
+        return None
+
+    def cast_char_param_type(self, value):
+        """
+        Return the type of a bound string parameter: cast_char_param, or
+        cast_long_char_param if ``value`` doesn't fit in it.
+        """
+        if len(value) > self.cast_char_param_max_length:
+            return self.cast_long_char_param
+        return self.cast_char_param
+
+    def input_size(self, field):
+        """
+        Return the pyodbc setinputsizes() entry for a parameter bound to the
+        given field's column, or None to let pyodbc infer it from the value,
+        e.g. for a CharField without max_length.
+        """
+        if field is None:
+            return None
+        m = _db_type_re.match(field.db_type(self.connection) or '')
+        if m is None or m.group(1).lower() not in self.input_size_types:
+            return None
+        name, size, digits = m.groups()
+        name = name.lower()
+        sql_type = getattr(self.connection.Database, self.input_size_types[name])
+        if name in self.input_size_precisions:
+            return (sql_type,) + self.input_size_precisions[name]
+        if size is None and name in self.input_size_sized_types:
+            return None
+        return (sql_type, int(size or 0), int(digits or 0))
+
+    def param_adapter(self, field, prepared=True):
+        """
+        Return the callable adapting the executemany() values bound to the
+        given field's column, or None if they are sent as they are. Values
+        ``prepared`` by the field (get_db_prep_save()) only need booleans
+        turned into integers; raw ones are also rounded or converted as the
+        field would.
+        """
+        if field is None:
+            return None
+        internal_type = field.get_internal_type()
+        if internal_type in ('BooleanField', 'NullBooleanField'):
+            return _bool_param
+        if prepared:
+            return None
+        if internal_type == 'DecimalField':
+            return functools.partial(
+                self.adapt_decimalfield_value,
+                max_digits=field.max_digits, decimal_places=field.decimal_places)
+        if internal_type == 'DateTimeField':
+            return self.adapt_datetimefield_value
+        if internal_type == 'DateField':
+            return self.adapt_datefield_value
+        if internal_type == 'TimeField':
+            return self.adapt_timefield_value
+        return None
+
+    explain_on_sql = 'SET DUMP PLAN ON'
+    explain_off_sql = 'SET DUMP PLAN OFF'
+
+    def explain_plan(self, connection, sql, args):
+        """
+        Run a translated SELECT and its ``args`` on a cursor of the pyodbc
+        ``connection`` with DBMaker's plan dump enabled and return the plan
+        reported through the driver's diagnostic messages, or None if the
+        driver doesn't expose them.
+        """
+        Database = self.connection.Database
+        raw_cursor = connection.cursor()
+        try:
+            raw_cursor.execute(self.explain_on_sql)
+            try:
+                raw_cursor.execute(sql, *args)
+                messages = getattr(raw_cursor, 'messages', None) or []
+            finally:
+                raw_cursor.execute(self.explain_off_sql)
+        except Database.Error as e:
+            return 'unavailable: %s' % (e.args[-1] if e.args else e)
+        finally:
+            raw_cursor.close()
+        return '\n'.join(str(message[-1]) for message in messages) or None
+
+    # Slices of BLOB/NCLOB columns, see django_dbmaker.lobs. Positions are
+    # 1-based, in bytes for BLOBs and characters for NCLOBs. Appending
+    # rewrites the whole value, write_lob() sizes its slices accordingly.
+    lob_slice_sql = 'SUBSTRING(%s, %%s, %%s)'
+    lob_append_sql = '%(column)s = %(column)s || CAST(%%s AS %(type)s)'
+    # Length in bytes of a BLOB, in characters of an NCLOB.
+    lob_length_sql = 'BLOBLEN(%s)'
+    lob_char_length_sql = 'LENGTH(%s)'
+
     def last_insert_id(self, cursor, table_name, pk_name):
 #         table_name = self.quote_name(table_name)
 #         cursor.execute("SELECT CAST(IDENT_CURRENT(%s) as bigint)", [table_name])
@@ -316,11 +505,56 @@ class DatabaseOperations(BaseDatabaseOperations):
         """
         return super(DatabaseOperations, self).last_executed_query(cursor, cursor.last_sql, cursor.last_params)
 
+    def bulk_batch_size(self, fields, objs):
+        """
+        Return the maximum number of rows sent in one multi-row statement,
+        bounded by the number of parameters a statement may bind and by the
+        length of the generated SQL.
+        """
+        features = self.connection.features
+        num_fields = max(len(fields), 1)
+        header_length = 64 + sum(
+            len(getattr(f, 'column', None) or str(f)) + 4 for f in fields)
+        # "(?, ?, ..., ?), " for each row.
+        row_length = 3 * num_fields + 2
+        max_rows = min(
+            features.max_query_params // num_fields,
+            (features.max_statement_length - header_length) // row_length,
+        )
+        return max(1, min(len(objs), max_rows))
+
+    def for_update_sql(self, nowait=False, skip_locked=False, of=()):
+        """
+        Return the FOR UPDATE clause, OF taking columns. DBMaker has no
+        NOWAIT clause.
+        """
+        return 'FOR UPDATE%s' % (' OF %s' % ', '.join(of) if of else '')
+
     def bulk_insert_sql(self, fields, placeholder_rows):
         placeholder_rows_sql = (", ".join(row) for row in placeholder_rows)
         values_sql = ", ".join("(%s)" % sql for sql in placeholder_rows_sql)
         return "VALUES " + values_sql
 
+    # A table with a single row, the current connection's.
+    single_row_table = 'SYSCONINFO'
+
+    def insert_unless_exists_sql(self, table, columns, values, conflict):
+        """
+        Return an INSERT of ``values`` into ``columns`` of ``table`` adding
+        no row if one of the table matches the ``conflict`` condition. The
+        values are selected, so parameters must be typed with CAST().
+        """
+        return 'INSERT INTO %s (%s) SELECT %s FROM %s WHERE NOT EXISTS (SELECT 1 FROM %s WHERE %s)' % (
+            table, columns, values, self.single_row_table, table, conflict)
+
+    def conflict_exists_sql(self, table, conflict):
+        """Return a SELECT of the rows of ``table`` matching ``conflict``."""
+        return 'SELECT 1 FROM %s WHERE %s' % (table, conflict)
+
+    def update_conflicts_sql(self, table, assignments, conflict):
+        """Return the UPDATE of an upsert, of the rows matching ``conflict``."""
+        return 'UPDATE %s SET %s WHERE %s' % (table, assignments, conflict)
+
     def savepoint_commit_sql(self, sid):
        """
        Returns the SQL for committing the given savepoint.
@@ -429,10 +663,16 @@ class DatabaseOperations(BaseDatabaseOperations):
     def adapt_decimalfield_value(self, value, max_digits=None, decimal_places=None):
         """
         Transform a decimal.Decimal value to an object compatible with what is
-        expected by the backend driver for decimal (numeric) columns.
-        """
-        strvalue = super().adapt_decimalfield_value(value, max_digits, decimal_places)
-        return Decimal(strvalue)
+        expected by the backend driver for decimal (numeric) columns, rounded
+        as utils.format_number() does but without its round trip through str.
+        """
+        if isinstance(value, Decimal) and not value.is_finite():
+            raise ValueError("DBMaker backend does not support %s decimals." % value)
+        if value is None or decimal_places is None:
+            strvalue = super().adapt_decimalfield_value(value, max_digits, decimal_places)
+            return None if strvalue is None else Decimal(strvalue)
+        exponent, context = _decimal_rounding(max_digits, decimal_places)
+        return value.quantize(exponent, context=context)
     
     def year_lookup_bounds(self, value):
         """
@@ -487,10 +727,11 @@ class DatabaseOperations(BaseDatabaseOperations):
     def get_db_converters(self, expression):
         converters = super().get_db_converters(expression)
         internal_type = expression.output_field.get_internal_type()       
-        #if internal_type == 'IntegerField':
-            #converters.append(self.convert_intfield_value)
         if internal_type == 'FloatField':
-            converters.append(self.convert_floatfield_value)
+            # The driver already returns DOUBLE columns as floats; only
+            # computed values may come back as integers or decimals.
+            if not isinstance(expression, Col):
+                converters.append(self.convert_floatfield_value)
         elif internal_type == 'UUIDField':
             converters.append(self.convert_uuidfield_value)
         elif internal_type in ['BooleanField', 'NullBooleanField']:
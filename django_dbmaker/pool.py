@@ -0,0 +1,279 @@
+"""
+In-process pool of pyodbc connections, enabled per database alias with
+OPTIONS['POOL'] = {'min': 1, 'max': 10, 'timeout': 30, 'max_lifetime': 3600,
+'idle_timeout': 600}.
+
+Pools are shared by all threads of a process and are thrown away in forked
+children, which open their own connections.
+"""
+import threading
+import time
+import weakref
+from collections import deque
+
+from .base import Database
+from .registry import Registry, leak_inherited
+
+POOL_DEFAULTS = {
+    'min': 0,
+    'max': 10,
+    'timeout': 30,
+    'max_lifetime': 3600,
+    'idle_timeout': 600,
+}
+
+# Checks that a connection taken from the pool is still alive.
+PING_SQL = 'SELECT 1 FROM SYSCONINFO'
+
+_pools = Registry()
+
+
+class PoolTimeout(Database.OperationalError):
+    """No connection became available within the pool's timeout."""
+
+
+class ConnectionPool(object):
+    """
+    A bounded pool of connections created by ``connect()``. Connections are
+    rolled back when returned, checked with a ping when taken, retired after
+    ``max_lifetime`` seconds and closed by a reaper thread after staying
+    idle for ``idle_timeout`` seconds, keeping at least ``min`` open.
+    """
+    def __init__(self, connect, min=0, max=10, timeout=30, max_lifetime=3600,
+                 idle_timeout=600):
+        if max < 1 or min > max:
+            raise ValueError("POOL requires 0 <= min <= max and max >= 1.")
+        self.connect = connect
+        self.min_size = min
+        self.max_size = max
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self._reset_state()
+
+    def _reset_state(self):
+        self._cond = threading.Condition()
+        # Idle connections as (connection, created_at, returned_at), most
+        # recently returned last.
+        self._idle = deque()
+        self._created = {}
+        # Fingerprint of the session settings applied to each connection.
+        self._sessions = {}
+        self._size = 0
+        self._reaper = None
+        self._closed = False
+
+    def _after_fork(self):
+        # Connections inherited from the parent belong to its sessions, which
+        # it keeps using.
+        for connection, created_at, returned_at in self._idle:
+            leak_inherited(connection)
+        self._reset_state()
+
+    def _expired(self, created_at, now):
+        return self.max_lifetime is not None and now - created_at > self.max_lifetime
+
+    def _open(self):
+        connection = self.connect()
+        now = time.monotonic()
+        self._created[id(connection)] = now
+        return connection, now
+
+    def _discard(self, connection):
+        # Called with the lock held, the connection no longer counts.
+        self._created.pop(id(connection), None)
+        self._sessions.pop(id(connection), None)
+        self._size -= 1
+        self._cond.notify()
+        try:
+            connection.close()
+        except Database.Error:
+            pass
+
+    def prewarm(self):
+        """Open connections until ``min`` of them are available."""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    break
+                self._size += 1
+            try:
+                connection, now = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((connection, now, now))
+                self._cond.notify()
+        self._start_reaper()
+
+    def acquire(self):
+        """
+        Return an idle connection that answers a ping, or open a new one
+        while the pool holds fewer than ``max``. Otherwise wait up to
+        ``timeout`` seconds for one to be released.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                connection = self._take_idle(deadline)
+            if connection is None:
+                break
+            if self._alive(connection):
+                return connection
+            with self._cond:
+                self._discard(connection)
+        try:
+            connection, now = self._open()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self._start_reaper()
+        return connection
+
+    def _take_idle(self, deadline):
+        # Called with the lock held. Return an idle connection, or None once
+        # a slot for a new one is reserved.
+        while True:
+            now = time.monotonic()
+            while self._idle:
+                connection, created_at, returned_at = self._idle.pop()
+                if self._expired(created_at, now):
+                    self._discard(connection)
+                    continue
+                return connection
+            if self._size < self.max_size:
+                self._size += 1
+                return None
+            remaining = deadline - now
+            if remaining <= 0:
+                raise PoolTimeout(
+                    'HYT00', 'No connection available in the pool after %ss.' % self.timeout)
+            self._cond.wait(remaining)
+
+    def _alive(self, connection):
+        # The server may have dropped the connection while it sat idle.
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(PING_SQL)
+            finally:
+                cursor.close()
+        except Database.Error:
+            return False
+        return True
+
+    def release(self, connection, discard=False):
+        """
+        Hand a connection back. It is rolled back, its autocommit mode is
+        left to the next DatabaseWrapper to set; connections that fail to
+        roll back, are past ``max_lifetime`` or are explicitly discarded get
+        closed instead.
+        """
+        created_at = self._created.get(id(connection))
+        if created_at is None:
+            # Not ours: opened before a fork, by the parent.
+            leak_inherited(connection)
+            return
+        if not discard:
+            try:
+                if not connection.autocommit:
+                    connection.rollback()
+            except Database.Error:
+                discard = True
+        now = time.monotonic()
+        with self._cond:
+            if discard or self._closed or self._expired(created_at, now):
+                self._discard(connection)
+            else:
+                self._idle.append((connection, created_at, now))
+                self._cond.notify()
+
+    def session_fingerprint(self, connection):
+        """Return the fingerprint recorded by set_session_fingerprint()."""
+        return self._sessions.get(id(connection))
+
+    def set_session_fingerprint(self, connection, fingerprint):
+        if id(connection) in self._created:
+            self._sessions[id(connection)] = fingerprint
+
+    def reap(self):
+        """Close connections idle for longer than ``idle_timeout``."""
+        if self.idle_timeout is None:
+            return
+        now = time.monotonic()
+        with self._cond:
+            keep = deque()
+            for item in self._idle:
+                connection, created_at, returned_at = item
+                if self._size > self.min_size and (
+                        now - returned_at > self.idle_timeout or self._expired(created_at, now)):
+                    self._discard(connection)
+                else:
+                    keep.append(item)
+            self._idle = keep
+
+    def _start_reaper(self):
+        if self.idle_timeout is None or self._reaper is not None:
+            return
+        with self._cond:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(
+                target=_reap_forever, args=(weakref.ref(self), max(self.idle_timeout / 2.0, 1)),
+                name='dbmaker-pool-reaper', daemon=True)
+            self._reaper.start()
+
+    def close(self):
+        """Close all idle connections; busy ones are closed when released."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max': self.max_size,
+            }
+
+
+def _reap_forever(pool_ref, interval):
+    thread = threading.current_thread()
+    while True:
+        time.sleep(interval)
+        pool = pool_ref()
+        if pool is None or pool._closed or pool._reaper is not thread:
+            return
+        pool.reap()
+        del pool
+
+
+def get_pool(key, connect, options):
+    """
+    Return the process-wide pool registered under ``key``, creating and
+    pre-warming it with ``connect`` and the OPTIONS['POOL'] settings on
+    first use.
+    """
+    pool = _pools.get(key)
+    if pool is None:
+        settings = dict(POOL_DEFAULTS)
+        settings.update(options or {})
+        pool = _pools.get_or_create(key, lambda: ConnectionPool(connect, **settings))
+        pool.prewarm()
+    return pool
+
+
+def close_pools():
+    """Close the idle connections of every pool of this process."""
+    with _pools.lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,152 @@
+"""
+Reuse of prepared statements.
+
+pyodbc only skips preparing a statement when a cursor runs the same SQL as
+its previous one. With OPTIONS['prepared_cursors'] set to a size, cursors
+aren't closed after use but kept per connection in a CursorPool, keyed by
+the statement they last ran, and taken from it again to run that statement:
+
+    'OPTIONS': {'prepared_cursors': 50}
+
+Hot paths can hold a statement on a cursor of its own instead:
+
+    lookup = connection.prepare('SELECT id FROM app_token WHERE key = %s')
+    for key in keys:
+        row = lookup.execute([key]).fetchone()
+    lookup.close()
+"""
+from .base import Database
+
+from .cache import LRUCache
+
+# SQL_CURSOR_COMMIT_BEHAVIOR / SQL_CURSOR_ROLLBACK_BEHAVIOR value telling
+# that ending a transaction drops the prepared statements.
+SQL_CB_DELETE = 0
+
+
+def keeps_prepared(connection):
+    """
+    Return whether the prepared statements of a pyodbc connection survive
+    commits and rollbacks, as needed to reuse them.
+    """
+    try:
+        return all(
+            connection.getinfo(info_type) != SQL_CB_DELETE
+            for info_type in (Database.SQL_CURSOR_COMMIT_BEHAVIOR, Database.SQL_CURSOR_ROLLBACK_BEHAVIOR))
+    except (AttributeError, Database.Error):
+        # The driver can't tell, assume they do.
+        return True
+
+
+def _close_cursor(key, cursor):
+    try:
+        cursor.close()
+    except Database.Error:
+        pass
+
+
+class CursorPool(object):
+    """
+    Idle pyodbc cursors of a connection, keyed by ``(sql, timeout)``: the
+    statement each one last prepared and the timeout it was created with.
+    At most ``size`` are kept, the least recently used one is closed first.
+    Like the LRUCache it's built on, it belongs to a single DatabaseWrapper.
+    """
+    def __init__(self, size):
+        self._cursors = LRUCache(size, on_evict=_close_cursor)
+        # The pyodbc connection the cursors belong to.
+        self._connection = None
+
+    def take(self, connection, key):
+        """Return the idle cursor of ``connection`` prepared for ``key``, or None."""
+        if connection is not self._connection:
+            self.clear()
+            self._connection = connection
+        cursor = self._cursors.get(key)
+        if cursor is not None:
+            self._cursors.pop(key)
+        return cursor
+
+    def put(self, connection, key, cursor):
+        """Keep a cursor which last ran ``key`` on ``connection``, or close it."""
+        if (connection is not self._connection or key in self._cursors or
+                self._cursors.maxsize <= 0):
+            _close_cursor(key, cursor)
+            return
+        try:
+            if cursor.description is not None:
+                # Release the rest of the result set, and the locks it may
+                # hold; pyodbc keeps the statement prepared.
+                while cursor.nextset():
+                    pass
+        except Database.Error:
+            _close_cursor(key, cursor)
+            return
+        self._cursors.set(key, cursor)
+
+    def clear(self):
+        """Close all the idle cursors."""
+        self._cursors.clear()
+        self._connection = None
+
+    def stats(self):
+        return self._cursors.stats()
+
+
+class PreparedStatement(object):
+    """
+    A statement run repeatedly on a Django cursor of its own, so that the
+    driver prepares it only once. Returned by ``connection.prepare(sql)``;
+    like the connection, it must only be used by the thread that created it.
+    """
+    def __init__(self, connection, sql):
+        self.connection = connection
+        self.sql = sql
+        self._cursor = None
+        self._raw = None
+
+    @property
+    def cursor(self):
+        connection = self.connection
+        connection.ensure_connection()
+        if self._cursor is None or self._raw is not connection.connection:
+            # First use, or the connection was closed since.
+            self._cursor = connection.cursor()
+            self._raw = connection.connection
+        return self._cursor
+
+    def execute(self, params=None):
+        self.cursor.execute(self.sql, params)
+        return self
+
+    def executemany(self, param_list):
+        self.cursor.executemany(self.sql, param_list)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, attr):
+        # rowcount, description...
+        return getattr(self._cursor, attr)
+
+    def close(self):
+        cursor, self._cursor = self._cursor, None
+        self._raw = None
+        if cursor is not None:
+            cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
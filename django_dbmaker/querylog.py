@@ -0,0 +1,89 @@
+"""
+Bounded query log, configured per alias with OPTIONS['query_log']:
+
+    'query_log': {'mode': 'sample', 'rate': 0.01, 'size': 1000}
+
+``mode`` is 'off' (default), 'sample' (record a ``rate`` fraction of the
+statements) or 'ring' (record every statement). Either way only the last
+``size`` entries are kept, in ``connection.queries``. Entries hold the
+statement and its parameters, they are only formatted when read.
+"""
+import logging
+import random
+from collections import deque
+from time import time
+
+from django.db.backends import utils
+from django.db.backends.base.operations import BaseDatabaseOperations
+
+logger = logging.getLogger('django.db.backends')
+
+QUERY_LOG_MODES = ('off', 'sample', 'ring')
+
+
+class QueryLog(object):
+    def __init__(self, mode='off', rate=1.0, size=1000):
+        if mode not in QUERY_LOG_MODES:
+            raise ValueError("query_log mode must be one of %s." % ', '.join(QUERY_LOG_MODES))
+        self.mode = mode
+        self.rate = rate if mode == 'sample' else 1.0
+        self.entries = deque(maxlen=size)
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def should_record(self):
+        return self.rate >= 1.0 or random.random() < self.rate
+
+    def record(self, sql, params, duration):
+        self.entries.append((sql, params, duration))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('(%.3f) %s; args=%s', duration, sql, params,
+                         extra={'duration': duration, 'sql': sql, 'params': params})
+
+    def queries(self, ops):
+        """Return the entries as ``connection.queries`` lists them."""
+        return [self.format(ops, entry) for entry in list(self.entries)]
+
+    def format(self, ops, entry):
+        if isinstance(entry, dict):
+            # Appended by Django's debug cursor, under DEBUG.
+            return entry
+        sql, params, duration = entry
+        # The backend's own last_executed_query() reads the cursor's state,
+        # which is gone by now.
+        return {
+            'sql': BaseDatabaseOperations.last_executed_query(ops, None, sql, params),
+            'time': '%.3f' % duration,
+        }
+
+
+class QueryLogCursorWrapper(utils.CursorWrapper):
+    """
+    Cursor wrapper recording the statements selected by the connection's
+    QueryLog.
+    """
+    def execute(self, sql, params=None):
+        query_log = self.db.query_log
+        if not query_log.should_record():
+            return super(QueryLogCursorWrapper, self).execute(sql, params)
+        start = time()
+        try:
+            return super(QueryLogCursorWrapper, self).execute(sql, params)
+        finally:
+            query_log.record(sql, params, time() - start)
+
+    def executemany(self, sql, param_list):
+        query_log = self.db.query_log
+        if not query_log.should_record():
+            return super(QueryLogCursorWrapper, self).executemany(sql, param_list)
+        start = time()
+        try:
+            return super(QueryLogCursorWrapper, self).executemany(sql, param_list)
+        finally:
+            try:
+                times = len(param_list)
+            except TypeError:
+                times = '?'
+            query_log.record('%s -- x%s' % (sql, times), None, time() - start)
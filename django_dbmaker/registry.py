@@ -0,0 +1,59 @@
+"""
+Process-wide state of the backend, shared by all threads: connection pools,
+result caches, serial allocators, replica sets and the like are kept in
+Registry instances, which are reset in forked children.
+"""
+import os
+import threading
+
+_registries = []
+# Connections inherited from the parent process. They are deliberately
+# leaked: closing them, or letting the garbage collector do it, would
+# disconnect the parent's sessions.
+_inherited = []
+
+
+class Registry(dict):
+    """
+    Objects shared by all threads of a process, created on first use under
+    their key. In a forked child, the registry is emptied if
+    ``clear_after_fork``, else each object's _after_fork() is called.
+    """
+    def __init__(self, clear_after_fork=False):
+        super(Registry, self).__init__()
+        self.clear_after_fork = clear_after_fork
+        self.lock = threading.Lock()
+        _registries.append(self)
+
+    def get_or_create(self, key, create):
+        """Return the object under ``key``, storing ``create()`` if none."""
+        obj = self.get(key)
+        if obj is None:
+            with self.lock:
+                obj = self.get(key)
+                if obj is None:
+                    obj = self[key] = create()
+        return obj
+
+    def _after_fork(self):
+        self.lock = threading.Lock()
+        if self.clear_after_fork:
+            self.clear()
+        else:
+            for obj in self.values():
+                obj._after_fork()
+
+
+def leak_inherited(connection):
+    """Keep a connection of the parent process open in a forked child."""
+    if connection is not None:
+        _inherited.append(connection)
+
+
+def _reset_after_fork():
+    for registry in _registries:
+        registry._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
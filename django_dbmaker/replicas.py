@@ -0,0 +1,147 @@
+"""
+Read replicas, configured per alias with OPTIONS['replicas']:
+
+    'replicas': [
+        {'HOST': 'replica1', 'PORT': '2453', 'weight': 2},
+        {'HOST': 'replica2', 'weight': 1},
+    ],
+
+Entries may also override NAME, USER and PASSWORD. SELECTs run outside of
+atomic blocks and in autocommit mode are sent to a replica, everything else
+to the primary (HOST). A connection reads from the healthy host with the
+fewest in-flight queries relative to its weight and keeps it while it's
+healthy; pooled connections choose again between requests. Hosts failing to
+connect or dropping their
+connection are skipped for ``replica_check_interval`` seconds, after which
+the next connection attempt probes them again.
+"""
+import random
+import re
+import threading
+import time
+
+from .base import Database
+from .registry import Registry
+
+_replica_sets = Registry()
+
+_read_re = re.compile(r'^\s*\(?\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+_for_update_re = re.compile(r'\bFOR\s+UPDATE\b', re.IGNORECASE)
+
+
+def is_read(sql):
+    """Return whether ``sql`` only reads and may run on a replica."""
+    return bool(_read_re.match(sql)) and not _for_update_re.search(sql)
+
+
+def is_connection_error(error):
+    """
+    Return whether a pyodbc error means the connection itself is unusable
+    (SQLSTATE class 08, or an error raised by the driver manager).
+    """
+    if isinstance(error, Database.InterfaceError):
+        return True
+    sqlstate = error.args[0] if error.args else ''
+    return isinstance(sqlstate, str) and sqlstate.startswith('08')
+
+
+class Replica(object):
+    def __init__(self, settings):
+        if isinstance(settings, str):
+            settings = {'HOST': settings}
+        self.settings = settings
+        self.weight = settings.get('weight', 1)
+        if self.weight <= 0:
+            raise ValueError("Replica weights must be positive.")
+        self.outstanding = 0
+        self.down_until = 0.0
+
+    @property
+    def name(self):
+        host = self.settings.get('HOST', '')
+        port = self.settings.get('PORT')
+        return '%s:%s' % (host, port) if port else host
+
+    def conn_params(self, primary_params):
+        """Return pyodbc connect() arguments derived from the primary's."""
+        params = dict(primary_params)
+        for setting, param in (('HOST', 'host'), ('PORT', 'port'), ('NAME', 'database'),
+                               ('USER', 'user'), ('PASSWORD', 'password')):
+            if self.settings.get(setting):
+                params[param] = self.settings[setting]
+        return params
+
+    def __repr__(self):
+        return '<Replica %s weight=%s outstanding=%s>' % (self.name, self.weight, self.outstanding)
+
+
+class ReplicaSet(object):
+    """
+    The replicas of an alias, shared by all threads of a process, with
+    their in-flight query counts and health.
+    """
+    def __init__(self, replicas, check_interval=30):
+        if not replicas:
+            raise ValueError("OPTIONS['replicas'] must list at least one host.")
+        self.replicas = [Replica(settings) for settings in replicas]
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+
+    def choose(self, current=None):
+        """
+        Return the healthy replica with the fewest in-flight queries per
+        unit of weight, or None if all are down. ``current``, the replica
+        the caller is connected to, is kept when it's one of the best;
+        other ties are broken at random.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [r for r in self.replicas if r.down_until <= now]
+            if not candidates:
+                return None
+            best = min((r.outstanding + 1) / r.weight for r in candidates)
+            best = [r for r in candidates if (r.outstanding + 1) / r.weight == best]
+            if current in best:
+                return current
+            return random.choice(best)
+
+    def is_healthy(self, replica):
+        with self._lock:
+            return replica.down_until <= time.monotonic()
+
+    def begin(self, replica):
+        with self._lock:
+            replica.outstanding += 1
+
+    def end(self, replica):
+        with self._lock:
+            replica.outstanding -= 1
+
+    def mark_down(self, replica):
+        """Skip ``replica`` until the next health check is due."""
+        with self._lock:
+            replica.down_until = time.monotonic() + self.check_interval
+
+    def mark_up(self, replica):
+        with self._lock:
+            replica.down_until = 0.0
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                'replica': r.name,
+                'weight': r.weight,
+                'outstanding': r.outstanding,
+                'healthy': r.down_until <= now,
+            } for r in self.replicas]
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        for replica in self.replicas:
+            replica.outstanding = 0
+
+
+def get_replica_set(key, replicas, check_interval):
+    """Return the process-wide ReplicaSet registered under ``key``."""
+    return _replica_sets.get_or_create(key, lambda: ReplicaSet(replicas, check_interval))
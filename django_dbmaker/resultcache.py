@@ -0,0 +1,332 @@
+"""
+Read-through cache of query results, enabled per alias with
+OPTIONS['result_cache']:
+
+    'result_cache': {
+        'tables': ['app_country', 'app_currency'],  # the only ones cached
+        'size': 1000,          # entries, least recently used evicted first
+        'max_rows': 1000,      # larger results aren't cached
+        'ttl': None,           # seconds an entry may be served
+        'check_interval': 1.0, # seconds between checks for remote writes
+    }
+
+SELECTs run outside of transactions whose tables are all listed are
+answered from memory, keyed by their SQL and parameters. Writes going
+through the cursor evict the entries of the tables they touch and, once
+their transaction commits, bump the table's row in ``dbmaker_cache_version``
+on a connection of the cache's own; other processes poll that table every
+``check_interval`` seconds, which bounds how long they may serve a result
+changed elsewhere.
+"""
+import functools
+import logging
+import re
+import threading
+import time
+
+from .base import Database
+from .cache import LRUCache
+from .registry import Registry, leak_inherited
+
+VERSION_TABLE = 'dbmaker_cache_version'
+
+RESULT_CACHE_DEFAULTS = {
+    'tables': (),
+    'size': 1000,
+    'max_rows': 1000,
+    'ttl': None,
+    'check_interval': 1.0,
+}
+
+logger = logging.getLogger('django.db.backends')
+
+_select_re = re.compile(r'^\s*\(?\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+_identifier = r'(?:"[^"]+"|`[^`]+`|\[[^\]]+\]|\w+)'
+# A table name, optionally qualified by its schema.
+_name = r'%s(?:\s*\.\s*%s)?' % (_identifier, _identifier)
+# A table name and its optional alias.
+_table = r'%s(?:\s+(?:AS\s+)?%s)?' % (_name, _identifier)
+# The tables named after these keywords; FROM may list several, comma
+# separated.
+_table_re = re.compile(
+    r'\b(?:(?:JOIN|INTO|UPDATE|TABLE)\s+(%s)|FROM\s+(%s(?:\s*,\s*%s)*))' % (_name, _table, _table),
+    re.IGNORECASE)
+_list_item_re = re.compile(r'(?:^|,)\s*(%s)' % _name)
+_part_re = re.compile(_identifier)
+
+# Tables whose rows depend on the session reading them, e.g. LAST_SERIAL.
+# They are never cached, whatever 'tables' lists.
+SESSION_TABLES = frozenset(['sysconinfo'])
+
+_caches = Registry()
+
+
+def _table_name(name):
+    # The unquoted table of a possibly schema-qualified name. Schemas are
+    # dropped: writes evict the entries of every table of that name.
+    return _part_re.findall(name)[-1].strip('"`[]').lower()
+
+
+def referenced_tables(sql):
+    """Return the names of the tables ``sql`` reads or writes."""
+    tables = set()
+    for name, from_list in _table_re.findall(sql):
+        if name:
+            tables.add(_table_name(name))
+        else:
+            tables.update(_table_name(item) for item in _list_item_re.findall(from_list))
+    return frozenset(tables)
+
+
+def writes(sql):
+    """
+    Return whether ``sql`` may change data, i.e. isn't a query; locking
+    reads (FOR UPDATE) don't.
+    """
+    return not _select_re.match(sql)
+
+
+class CachedResult(object):
+    """Stands in for a pyodbc cursor over a result served from the cache."""
+    def __init__(self, description, rows):
+        self.description = description
+        self.rowcount = len(rows)
+        self._rows = rows
+        self._position = 0
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchmany(self, size):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        pass
+
+
+class ResultCache(object):
+    def __init__(self, alias, **options):
+        unknown = set(options) - set(RESULT_CACHE_DEFAULTS)
+        if unknown:
+            raise ValueError("Unknown result_cache options: %s." % ', '.join(sorted(unknown)))
+        settings = dict(RESULT_CACHE_DEFAULTS, **options)
+        self.alias = alias
+        self.tables = frozenset(table.lower() for table in settings['tables']) - SESSION_TABLES
+        self.max_rows = settings['max_rows']
+        self.ttl = settings['ttl']
+        self.check_interval = settings['check_interval']
+        self._reset_state(settings['size'])
+
+    def _reset_state(self, size):
+        self._lock = threading.Lock()
+        self._entries = LRUCache(size, on_evict=self._forget)
+        # Keys of the entries reading each table.
+        self._index = {}
+        # Evictions of each table, and of everything: a result read before
+        # one of its tables changed isn't stored, see set().
+        self._generations = {}
+        self._epoch = 0
+        # Last known version of each table; missing means 0.
+        self._versions = {}
+        self._checked_at = 0.0
+        self._connection = None
+        # pyodbc connections can't be used by two threads at once.
+        self._connection_lock = threading.Lock()
+        self._seeded = set()
+
+    def _after_fork(self):
+        leak_inherited(self._connection)
+        self._reset_state(self._entries.maxsize)
+
+    def _forget(self, key, entry):
+        for table in entry[1]:
+            keys = self._index.get(table)
+            if keys is not None:
+                keys.discard(key)
+
+    def cacheable(self, tables):
+        return bool(tables) and tables <= self.tables
+
+    def _version_connection(self, connection):
+        # Version checks and counter rows are handled on a connection of
+        # our own, outside of the callers' transactions. Called with
+        # _connection_lock held.
+        if self._connection is None:
+            raw = connection.connect_function(connection.get_connection_params())()
+            raw.autocommit = True
+            quote_name = connection.ops.quote_name
+            try:
+                raw.cursor().execute(
+                    'CREATE TABLE %s (%s NVARCHAR(128) NOT NULL PRIMARY KEY, %s BIGINT NOT NULL)' % (
+                        quote_name(VERSION_TABLE), quote_name('name'), quote_name('version')))
+            except Database.Error:
+                # It already exists.
+                pass
+            self._connection = raw
+        return self._connection
+
+    def check_versions(self, connection):
+        """
+        Drop the entries of tables written by other processes. Return False
+        if the versions can't be read, the cache mustn't be used then.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return True
+        quote_name = connection.ops.quote_name
+        with self._connection_lock:
+            try:
+                cursor = self._version_connection(connection).cursor()
+                try:
+                    cursor.execute('SELECT %s, %s FROM %s' % (
+                        quote_name('name'), quote_name('version'), quote_name(VERSION_TABLE)))
+                    versions = dict(cursor.fetchall())
+                finally:
+                    cursor.close()
+            except Database.Error:
+                # Checked again on next use, over a new connection.
+                logger.warning("Failed to check the result cache versions of %r.",
+                               self.alias, exc_info=True)
+                self._discard_connection()
+                return False
+        self._checked_at = now
+        with self._lock:
+            for table, version in versions.items():
+                if self._versions.get(table, 0) != version:
+                    self._versions[table] = version
+                    self._invalidate(table)
+        return True
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            description, tables, rows, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._entries.pop(key)
+                self._forget(key, entry)
+                return None
+            return CachedResult(description, rows)
+
+    def generation(self, tables):
+        """Return a token telling whether entries of ``tables`` were evicted since."""
+        with self._lock:
+            return self._generation(tables)
+
+    def _generation(self, tables):
+        return (self._epoch,) + tuple(self._generations.get(table, 0) for table in sorted(tables))
+
+    def set(self, key, tables, description, rows, generation=None):
+        """
+        Store a result. With the ``generation()`` of its tables taken before
+        it was read, it's dropped if they were written meanwhile.
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if generation is not None and generation != self._generation(tables):
+                return
+            self._entries.set(key, (description, tables, rows, expires_at))
+            for table in tables:
+                self._index.setdefault(table, set()).add(key)
+
+    def _invalidate(self, table):
+        self._generations[table] = self._generations.get(table, 0) + 1
+        for key in self._index.pop(table, ()):
+            entry = self._entries.pop(key)
+            if entry is not None:
+                self._forget(key, entry)
+
+    def invalidate(self, connection, tables):
+        """
+        Evict the entries of ``tables``, written through ``connection``, and
+        bump their versions once its transaction commits.
+        None evicts everything, in this process only.
+        """
+        if tables is None:
+            with self._lock:
+                self._entries.clear()
+                self._index.clear()
+                self._epoch += 1
+            return
+        tables = frozenset(table for table in tables if table in self.tables)
+        if not tables:
+            return
+        with self._lock:
+            for table in tables:
+                self._invalidate(table)
+        if not connection.in_atomic_block:
+            # Autocommit, or a transaction managed by hand which gives no
+            # commit hook.
+            self.bump(connection, tables)
+            return
+        bump = functools.partial(self.bump, connection, tables)
+        pending = connection.run_on_commit[-1][1] if connection.run_on_commit else None
+        if not (isinstance(pending, functools.partial) and
+                (pending.func, pending.args) == (bump.func, bump.args)):
+            # Bumping in the writer's transaction would lock the version
+            # rows until it ends, serializing every writer of these tables.
+            connection.on_commit(bump)
+
+    def bump(self, connection, tables):
+        """Bump the versions of ``tables``, for all processes to evict them."""
+        with self._lock:
+            # Results cached by other threads before the commit are stale.
+            for table in tables:
+                self._invalidate(table)
+        quote_name = connection.ops.quote_name
+        with self._connection_lock:
+            try:
+                cursor = self._version_connection(connection).cursor()
+                try:
+                    for table in tables:
+                        if table not in self._seeded:
+                            try:
+                                cursor.execute('INSERT INTO %s (%s, %s) VALUES (?, 0)' % (
+                                    quote_name(VERSION_TABLE), quote_name('name'),
+                                    quote_name('version')), table)
+                            except Database.IntegrityError:
+                                pass
+                            self._seeded.add(table)
+                        cursor.execute('UPDATE %s SET %s = %s + 1 WHERE %s = ?' % (
+                            quote_name(VERSION_TABLE), quote_name('version'), quote_name('version'),
+                            quote_name('name')), table)
+                finally:
+                    cursor.close()
+            except Database.Error:
+                # The write is committed by now; don't fail the caller. Other
+                # processes catch up once their entries expire.
+                logger.warning("Failed to bump the result cache versions of %s.",
+                               ', '.join(sorted(tables)), exc_info=True)
+                self._discard_connection()
+
+    def _discard_connection(self):
+        # Called with _connection_lock held, reconnects on next use.
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Database.Error:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return dict(self._entries.stats(), tables=len(self._index))
+
+
+def get_result_cache(alias, options):
+    """Return the process-wide ResultCache of an alias."""
+    return _caches.get_or_create(alias, lambda: ResultCache(alias, **options))
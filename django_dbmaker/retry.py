@@ -0,0 +1,109 @@
+"""
+Retrying statements that failed on a deadlock or lock timeout, enabled per
+alias with OPTIONS['retry']:
+
+    'retry': {'attempts': 3, 'backoff': 0.05, 'max_backoff': 1.0}
+
+Statements run in autocommit mode are retried by the cursor. Transactions
+have to be replayed as a whole, by running them through ``retry_atomic``:
+
+    from django_dbmaker.retry import retry_atomic
+
+    @retry_atomic(using='default')
+    def transfer(source, target, amount):
+        ...
+"""
+import functools
+import logging
+import random
+import re
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger('django.db.backends')
+
+# Serialization failure / deadlock victim.
+TRANSIENT_SQLSTATES = ('40001',)
+_transient_message_re = re.compile(r'dead\s*lock|lock\s*time\s*-?\s*out', re.IGNORECASE)
+_native_code_re = re.compile(r'\((-?\d+)\)')
+
+
+def is_transient(error, codes=()):
+    """
+    Return whether a pyodbc (or Django wrapped) error is a deadlock or lock
+    timeout, worth retrying. ``codes`` are extra native DBMaker error codes
+    to treat as transient.
+    """
+    args = getattr(error, 'args', ())
+    if len(args) < 2 or not isinstance(args[1], str):
+        return False
+    sqlstate, message = args[0], args[1]
+    if sqlstate in TRANSIENT_SQLSTATES or _transient_message_re.search(message):
+        return True
+    return bool(codes) and any(int(code) in codes for code in _native_code_re.findall(message))
+
+
+class RetryPolicy(object):
+    """
+    Up to ``attempts`` tries, sleeping a random time up to ``backoff``
+    seconds doubled after each failure (capped at ``max_backoff``) in
+    between.
+    """
+    def __init__(self, attempts=3, backoff=0.05, max_backoff=1.0, codes=()):
+        if attempts < 1:
+            raise ValueError("retry attempts must be at least 1.")
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.codes = frozenset(codes)
+
+    def delays(self):
+        """
+        Yield the delay to wait before each retry, then None with the last
+        attempt.
+        """
+        for attempt in range(self.attempts - 1):
+            yield random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        yield None
+
+    def run(self, func, *args, **kwargs):
+        """Call ``func`` until it doesn't raise a transient error."""
+        for delay in self.delays():
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if delay is None or not is_transient(e, self.codes):
+                    raise
+                logger.warning('Transient database error, retrying in %.3fs: %s', delay, e)
+                time.sleep(delay)
+
+
+def retry_atomic(func=None, using=None, savepoint=True, **policy):
+    """
+    Decorator running a function in ``transaction.atomic(using, savepoint)``
+    and replaying the whole block when it fails on a transient error. The
+    policy defaults to the alias' OPTIONS['retry'] and can be overridden
+    with RetryPolicy arguments. Blocks nested in another transaction can't
+    be replayed on their own and run only once.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            alias = using or DEFAULT_DB_ALIAS
+            connection = connections[alias]
+            if connection.in_atomic_block:
+                with transaction.atomic(using=alias, savepoint=savepoint):
+                    return func(*args, **kwargs)
+            retry_policy = connection.retry_policy
+            if policy or retry_policy is None:
+                retry_policy = RetryPolicy(**policy)
+
+            def attempt():
+                with transaction.atomic(using=alias, savepoint=savepoint):
+                    return func(*args, **kwargs)
+            return retry_policy.run(attempt)
+        return inner
+    if func is not None:
+        return decorator(func)
+    return decorator
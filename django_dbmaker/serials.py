@@ -0,0 +1,196 @@
+"""
+Client-side allocation of AutoField/BigAutoField values.
+
+Models registered here get their primary keys from blocks of serial values
+reserved per process, instead of reading LAST_SERIAL after each INSERT:
+
+    from django_dbmaker import serials
+
+    serials.register(Event, block_size=1000)
+
+save() and bulk_create() then send a single INSERT with the key included,
+and bulk_create() can use executemany(). assign_pk() gives an instance its
+key before it's saved, e.g. to build related objects first; save it with
+``force_insert=True``.
+
+Blocks are reserved from a counter row per table in ``dbmaker_serial_block``
+(created on first use and seeded from the table's current maximum), over a
+separate connection committing on its own. Every writer of the table must
+go through the allocator, serial values assigned by DBMaker don't consume
+the counter: each reservation checks the table's maximum key and, when rows
+were inserted past the counter, warns with a RuntimeWarning and skips over
+them. Unused values of a block are lost when the process exits.
+"""
+import threading
+import warnings
+
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+from .base import Database
+from .registry import Registry, leak_inherited
+from .replicas import is_connection_error
+
+COUNTER_TABLE = 'dbmaker_serial_block'
+
+_registry = {}
+_allocators = Registry()
+
+
+class SerialBlocks(object):
+    """The serial values of a table reserved by this process."""
+    def __init__(self, table, column, block_size=1000):
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1.")
+        self.table = table
+        self.column = column
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._connection = None
+
+    def _counter_connection(self, connection):
+        # A connection of our own: reservations must be committed at once,
+        # whatever the caller's transaction does later.
+        if self._connection is None:
+            raw = connection.connect_function(connection.get_connection_params())()
+            raw.autocommit = False
+            quote_name = connection.ops.quote_name
+            try:
+                raw.cursor().execute(
+                    'CREATE TABLE %s (%s NVARCHAR(128) NOT NULL PRIMARY KEY, %s BIGINT NOT NULL)' % (
+                        quote_name(COUNTER_TABLE), quote_name('name'), quote_name('next_value')))
+                raw.commit()
+            except Database.Error:
+                # It already exists.
+                raw.rollback()
+            self._connection = raw
+        return self._connection
+
+    def _discard_connection(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Database.Error:
+                pass
+
+    def reserve(self, connection, size):
+        """Reserve ``size`` values and return the first one."""
+        reconnected = seeded = False
+        while True:
+            raw = self._counter_connection(connection)
+            cursor = None
+            try:
+                cursor = raw.cursor()
+                start = self._reserve(cursor, connection.ops.quote_name, size)
+                raw.commit()
+                return start
+            except Database.Error as e:
+                broken = is_connection_error(e)
+                try:
+                    raw.rollback()
+                except Database.Error:
+                    broken = True
+                if broken:
+                    # Reconnect, once. A reservation lost with the connection
+                    # only leaves a gap.
+                    self._discard_connection()
+                    if reconnected:
+                        raise
+                    reconnected = True
+                elif isinstance(e, Database.IntegrityError) and not seeded:
+                    # Another process seeded the counter first, update it.
+                    seeded = True
+                else:
+                    raise
+            finally:
+                if cursor is not None:
+                    try:
+                        cursor.close()
+                    except Database.Error:
+                        pass
+
+    def _reserve(self, cursor, quote_name, size):
+        counter = quote_name(COUNTER_TABLE)
+        cursor.execute('SELECT MAX(%s) FROM %s' % (quote_name(self.column), quote_name(self.table)))
+        first_free = (cursor.fetchone()[0] or 0) + 1
+        cursor.execute('UPDATE %s SET %s = %s + ? WHERE %s = ?' % (
+            counter, quote_name('next_value'), quote_name('next_value'), quote_name('name')),
+            size, self.table)
+        if not cursor.rowcount:
+            cursor.execute('INSERT INTO %s (%s, %s) VALUES (?, ?)' % (
+                counter, quote_name('name'), quote_name('next_value')),
+                self.table, first_free + size)
+            return first_free
+        cursor.execute('SELECT %s FROM %s WHERE %s = ?' % (
+            quote_name('next_value'), counter, quote_name('name')), self.table)
+        start = cursor.fetchone()[0] - size
+        if start < first_free:
+            # Keys at or past the counter: someone inserts without the
+            # allocator, and would have collided with this block.
+            warnings.warn(
+                "Rows of %s were inserted with keys past its serial block counter "
+                "(%d, the reserved block started at %d); every writer of a table "
+                "registered with django_dbmaker.serials must use the allocator." % (
+                    self.table, first_free - 1, start), RuntimeWarning)
+            cursor.execute('UPDATE %s SET %s = ? WHERE %s = ?' % (
+                counter, quote_name('next_value'), quote_name('name')),
+                first_free + size, self.table)
+            start = first_free
+        return start
+
+    def take(self, connection, count=1):
+        """Return ``count`` unused values."""
+        with self._lock:
+            values = []
+            while len(values) < count:
+                if self._next >= self._end:
+                    size = max(self.block_size, count - len(values))
+                    self._next = self.reserve(connection, size)
+                    self._end = self._next + size
+                n = min(count - len(values), self._end - self._next)
+                values.extend(range(self._next, self._next + n))
+                self._next += n
+            return values
+
+    def _after_fork(self):
+        # The parent's reservations and connection stay with the parent.
+        leak_inherited(self._connection)
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._connection = None
+
+
+def register(model, block_size=1000):
+    """Allocate the primary keys of ``model`` by blocks of ``block_size``."""
+    auto_field = model._meta.auto_field
+    if auto_field is None:
+        raise ValueError("%s has no AutoField primary key." % model.__name__)
+    _registry[model._meta.concrete_model] = block_size
+
+
+def unregister(model):
+    _registry.pop(model._meta.concrete_model, None)
+
+
+def get_allocator(model, using):
+    """Return the SerialBlocks of a registered model, else None."""
+    block_size = _registry.get(model._meta.concrete_model)
+    if block_size is None:
+        return None
+    opts = model._meta
+    return _allocators.get_or_create(
+        (using, opts.db_table),
+        lambda: SerialBlocks(opts.db_table, opts.auto_field.column, block_size))
+
+
+def assign_pk(instance, using=None):
+    """Give an unsaved instance of a registered model its primary key."""
+    model = type(instance)
+    if instance.pk is None:
+        using = using or router.db_for_write(model, instance=instance) or DEFAULT_DB_ALIAS
+        allocator = get_allocator(model, using)
+        if allocator is None:
+            raise ValueError("%s isn't registered with django_dbmaker.serials." % model.__name__)
+        instance.pk = allocator.take(connections[using])[0]
+    return instance.pk
@@ -0,0 +1,196 @@
+"""
+Slow query log, configured per alias with OPTIONS['slow_query']:
+
+    'slow_query': {
+        'threshold': 0.5,        # seconds, bind + execute + fetch
+        'redact_params': False,  # log parameter types instead of values
+        'explain': True,         # capture DBMaker's plan of slow SELECTs
+        'plan_interval': 300,    # capture a plan per statement at most every N seconds
+        'plan_queue': 10,        # plans waiting to be captured, more are dropped
+        'file': None,            # rotating log file, else the logger below
+        'max_bytes': 10 * 1024 * 1024,
+        'backup_count': 5,
+        'logger': 'django_dbmaker.slow_query',
+    }
+
+Plans are captured by running the SELECT again, on a thread and connection
+of their own, and logged as a separate 'slow query plan' entry.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+from . import monitoring, replicas
+from .base import Database
+from .cache import LRUCache
+from .registry import Registry, leak_inherited
+
+SLOW_QUERY_DEFAULTS = {
+    'threshold': 0.5,
+    'redact_params': False,
+    'explain': True,
+    'plan_interval': 300,
+    'plan_queue': 10,
+    'file': None,
+    'max_bytes': 10 * 1024 * 1024,
+    'backup_count': 5,
+    'logger': 'django_dbmaker.slow_query',
+}
+
+# Statements whose last plan capture is remembered.
+EXPLAINED_SIZE = 1000
+
+_explainers = Registry()
+
+
+class PlanExplainer(object):
+    """
+    Captures the plans of slow SELECTs on a daemon thread, over a connection
+    of its own, so that they are never run again on the request path. At
+    most ``queue_size`` plans wait to be captured; more are dropped.
+    """
+    def __init__(self, connect, session_statements, ops, queue_size):
+        self.connect = connect
+        self.session_statements = session_statements
+        self.ops = ops
+        self.queue_size = queue_size
+        self._reset_state()
+
+    def _reset_state(self):
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(self.queue_size)
+        self._thread = None
+        self._connection = None
+
+    def _after_fork(self):
+        leak_inherited(self._connection)
+        self._reset_state()
+
+    def submit(self, logger, entry, sql, args):
+        """
+        Queue the capture of the plan of ``sql``, to be logged with
+        ``entry`` to ``logger``. Return False if the queue is full.
+        """
+        try:
+            self._queue.put_nowait((logger, entry, sql, args))
+        except queue.Full:
+            return False
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name='dbmaker-plan-explainer', daemon=True)
+                    self._thread.start()
+        return True
+
+    def _run(self):
+        while True:
+            logger, entry, sql, args = self._queue.get()
+            entry['plan'] = self.explain(sql, args)
+            logger.warning('slow query plan %s', json.dumps(entry, default=str),
+                           extra={'slow_query_plan': entry})
+
+    def explain(self, sql, args):
+        try:
+            if self._connection is None:
+                connection = self.connect()
+                connection.autocommit = True
+                cursor = connection.cursor()
+                try:
+                    for statement in self.session_statements:
+                        cursor.execute(statement)
+                finally:
+                    cursor.close()
+                self._connection = connection
+            return self.ops.explain_plan(self._connection, sql, args)
+        except Database.Error as e:
+            connection, self._connection = self._connection, None
+            if connection is not None:
+                try:
+                    connection.close()
+                except Database.Error:
+                    pass
+            return 'unavailable: %s' % (e.args[-1] if e.args else e)
+
+
+def get_explainer(connection, queue_size):
+    """Return the process-wide PlanExplainer of a DatabaseWrapper's alias."""
+    return _explainers.get_or_create(connection.alias, lambda: PlanExplainer(
+        connection.connect_function(connection.get_connection_params()),
+        connection.session_statements(), connection.ops, queue_size))
+
+
+class SlowQueryLog(object):
+    def __init__(self, alias, **options):
+        unknown = set(options) - set(SLOW_QUERY_DEFAULTS)
+        if unknown:
+            raise ValueError("Unknown slow_query options: %s." % ', '.join(sorted(unknown)))
+        settings = dict(SLOW_QUERY_DEFAULTS, **options)
+        self.threshold = settings['threshold']
+        self.redact_params = settings['redact_params']
+        self.explain = settings['explain']
+        self.plan_interval = settings['plan_interval']
+        self.plan_queue = settings['plan_queue']
+        self.logger = logging.getLogger(settings['logger'])
+        if settings['file']:
+            self.logger = logging.getLogger('%s.%s' % (settings['logger'], alias))
+            if not self.logger.handlers:
+                handler = logging.handlers.RotatingFileHandler(
+                    settings['file'], maxBytes=settings['max_bytes'],
+                    backupCount=settings['backup_count'], encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+                self.logger.addHandler(handler)
+                self.logger.setLevel(logging.INFO)
+                self.logger.propagate = False
+        # Last plan capture per fingerprint.
+        self._explained = LRUCache(EXPLAINED_SIZE)
+
+    def format_params(self, params):
+        if params is None:
+            return None
+        if self.redact_params:
+            return ['<%s>' % type(p).__name__ for p in params]
+        return [p if isinstance(p, (int, float, type(None))) else str(p) for p in params]
+
+    def should_explain(self, event):
+        if not self.explain or event.error is not None or event.many:
+            return False
+        if not replicas.is_read(event.sql):
+            # Never run DML twice, nor wait for the locks the statement's own
+            # transaction holds.
+            return False
+        now = time.monotonic()
+        last = self._explained.get(event.fingerprint)
+        if last is not None and now - last < self.plan_interval:
+            return False
+        self._explained.set(event.fingerprint, now)
+        return True
+
+    def record(self, connection, event, cursor_wrapper):
+        entry = {
+            'alias': event.alias,
+            'fingerprint': event.fingerprint,
+            'sql': monitoring.normalize_sql(event.sql),
+            'params': self.format_params(event.params),
+            'elapsed': round(event.total_time, 6),
+            'execute_time': round(event.execute_time, 6),
+            'fetch_time': round(event.fetch_time, 6),
+            'rowcount': event.rowcount,
+            'error': event.error.__name__ if event.error is not None else None,
+        }
+        self.logger.warning('slow query %s', json.dumps(entry, default=str),
+                            extra={'slow_query': entry})
+        if self.should_explain(event):
+            params = event.params or ()
+            sql, inline, fingerprint = cursor_wrapper.translate_sql(event.sql, len(params))
+            if inline:
+                sql = sql % tuple(map(cursor_wrapper.quote_value, params))
+                params = ()
+            get_explainer(connection, self.plan_queue).submit(self.logger, {
+                'alias': event.alias,
+                'fingerprint': event.fingerprint,
+                'sql': entry['sql'],
+            }, sql, (params,) if params else ())
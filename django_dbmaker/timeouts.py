@@ -0,0 +1,134 @@
+"""
+Statement timeouts and deadlines.
+
+OPTIONS['statement_timeout'] sets the default query timeout of an alias in
+seconds, enforced by the driver. It can be changed for a block or a single
+queryset:
+
+    from django_dbmaker import timeouts
+
+    with timeouts.statement_timeout(30):
+        build_report()
+    rows = list(timeouts.with_timeout(Order.objects.filter(...), 5))
+
+``deadline()`` bounds the time left for all the statements of a block, e.g.
+a request: the driver timeout is shortened to the time remaining and a
+watchdog thread cancels statements still running once it has passed.
+Either way the statement fails with QueryTimeout.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .base import Database
+
+from django.db import DEFAULT_DB_ALIAS, connections, utils
+
+# Timeout expired, operation canceled.
+TIMEOUT_SQLSTATES = ('HYT00', 'HY008')
+
+
+class QueryTimeout(utils.OperationalError):
+    """A statement ran past its timeout or deadline."""
+
+
+def is_timeout(error):
+    args = getattr(error, 'args', ())
+    return bool(args) and args[0] in TIMEOUT_SQLSTATES
+
+
+@contextmanager
+def statement_timeout(seconds, using=DEFAULT_DB_ALIAS):
+    """Use a ``seconds`` timeout (None or 0 for none) for the block."""
+    connection = connections[using]
+    previous = connection.timeout_override
+    connection.timeout_override = seconds or 0
+    try:
+        yield
+    finally:
+        connection.timeout_override = previous
+
+
+@contextmanager
+def deadline(seconds, using=DEFAULT_DB_ALIAS):
+    """
+    Fail statements of the block running past ``seconds`` from now. Nested
+    deadlines can only shorten the current one.
+    """
+    connection = connections[using]
+    previous = connection.query_deadline
+    at = time.monotonic() + seconds
+    if previous is not None:
+        at = min(at, previous)
+    connection.query_deadline = at
+    try:
+        yield
+    finally:
+        connection.query_deadline = previous
+
+
+def with_timeout(queryset, seconds):
+    """Return a copy of ``queryset`` running with a ``seconds`` timeout."""
+    clone = queryset._chain()
+    clone.query.statement_timeout = seconds
+    return clone
+
+
+class Watchdog(object):
+    """
+    Thread cancelling the cursors whose deadline has passed, started on
+    first use.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._counter = itertools.count()
+        self._thread = None
+
+    def watch(self, cursor, at):
+        """Cancel ``cursor`` at ``at`` (time.monotonic()) unless unwatched."""
+        entry = [at, next(self._counter), cursor]
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='dbmaker-watchdog', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return entry
+
+    def unwatch(self, entry):
+        with self._cond:
+            entry[2] = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._heap and self._heap[0][2] is None:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                remaining = self._heap[0][0] - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                cursor = heapq.heappop(self._heap)[2]
+                # Under the lock: once unwatch() returns, the cursor may run
+                # another statement which must not be cancelled.
+                try:
+                    cursor.cancel()
+                except Database.Error:
+                    pass
+
+    def _after_fork(self):
+        self.__init__()
+
+
+watchdog = Watchdog()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=watchdog._after_fork)
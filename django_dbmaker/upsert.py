@@ -0,0 +1,71 @@
+"""
+Bulk upserts: inserting objects, or updating the rows they match on a set
+of unique fields instead:
+
+    from django_dbmaker.upsert import bulk_upsert
+
+    bulk_upsert(Price.objects, prices, unique_fields=['sku', 'day'],
+                update_fields=['amount'])
+
+The rows matching an object are updated first, then the other objects are
+inserted, one statement per object and kind sent through executemany().
+``bulk_create(ignore_conflicts=True)`` runs the same INSERTs, skipping the
+objects which conflict with a row on any unique constraint.
+"""
+from django.db import transaction
+from django.db.models import AutoField, sql
+from django.utils.functional import partition
+
+
+def bulk_upsert(queryset, objs, unique_fields, update_fields=(), batch_size=None):
+    """
+    Save ``objs`` with one pass of statements per batch: the rows matching
+    an object on ``unique_fields`` get its ``update_fields`` values, the
+    objects matching none are inserted. ``queryset`` is a QuerySet or a
+    Manager of their model. As with bulk_create(), no signal is sent and
+    the primary keys of inserted objects are only set for models registered
+    with django_dbmaker.serials.
+    """
+    queryset = queryset.all()
+    model = queryset.model
+    opts = model._meta
+    for parent in opts.get_parent_list():
+        if parent._meta.concrete_model is not opts.concrete_model:
+            raise ValueError("Can't bulk upsert a multi-table inherited model")
+    if not unique_fields:
+        raise ValueError('bulk_upsert() requires unique_fields.')
+    unique_fields = [opts.get_field(name) for name in unique_fields]
+    update_fields = [opts.get_field(name) for name in update_fields]
+    if any(not f.concrete or f.many_to_many for f in unique_fields + update_fields):
+        raise ValueError('bulk_upsert() can only be used with concrete fields.')
+    if any(f.primary_key for f in update_fields):
+        raise ValueError('bulk_upsert() cannot update primary key fields.')
+    objs = list(objs)
+    if not objs:
+        return objs
+    queryset._for_write = True
+    using = queryset.db
+    for obj in objs:
+        if obj.pk is None:
+            obj.pk = opts.pk.get_pk_value_on_save(obj)
+    fields = opts.concrete_fields
+    with transaction.atomic(using=using, savepoint=False):
+        objs_with_pk, objs_without_pk = partition(lambda o: o.pk is None, objs)
+        for batch_objs, batch_fields in (
+                (objs_with_pk, fields),
+                (objs_without_pk, [f for f in fields if not isinstance(f, AutoField)])):
+            if not batch_objs:
+                continue
+            if any(f not in batch_fields for f in unique_fields):
+                raise ValueError("Objects without a primary key can't be matched on it.")
+            size = batch_size or len(batch_objs)
+            for start in range(0, len(batch_objs), size):
+                query = sql.InsertQuery(model)
+                query.insert_values(batch_fields, batch_objs[start:start + size])
+                query.unique_fields = unique_fields
+                query.update_fields = update_fields
+                query.get_compiler(using=using).execute_sql()
+            for obj in batch_objs:
+                obj._state.adding = False
+                obj._state.db = using
+    return objs
@@ -0,0 +1,42 @@
+"""
+Django settings shared by the tests. Tests needing a DBMaker server are
+skipped unless DBMAKER_TEST_NAME is set, those only loading the backend
+unless pyodbc can be imported, see Tests in README.rst.
+"""
+import os
+import unittest
+
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+NAME = os.environ.get('DBMAKER_TEST_NAME')
+CONFIGURED = bool(NAME) and pyodbc is not None
+
+requires_server = unittest.skipUnless(
+    CONFIGURED, "DBMAKER_TEST_NAME isn't set, or pyodbc isn't installed.")
+requires_driver = unittest.skipUnless(pyodbc is not None, "pyodbc isn't installed.")
+
+
+def setup():
+    """Configure Django for the test database, unless it's already done."""
+    import django
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure(
+            DATABASES={
+                'default': {
+                    'ENGINE': 'django_dbmaker',
+                    'NAME': NAME or '',
+                    'USER': os.environ.get('DBMAKER_TEST_USER', ''),
+                    'PASSWORD': os.environ.get('DBMAKER_TEST_PASSWORD', ''),
+                    'HOST': os.environ.get('DBMAKER_TEST_HOST', ''),
+                    'PORT': os.environ.get('DBMAKER_TEST_PORT', ''),
+                },
+            },
+            INSTALLED_APPS=[],
+            USE_TZ=False,
+        )
+        django.setup()
@@ -0,0 +1,64 @@
+"""LRUCache, the bounded cache of statements, cursors and results."""
+import unittest
+
+from django_dbmaker.cache import LRUCache
+
+
+class LRUCacheTests(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        evicted = []
+        cache = LRUCache(2, on_evict=lambda key, value: evicted.append(key))
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertEqual(evicted, ['b'])
+        self.assertNotIn('b', cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_set_refreshes_existing_key(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('a', 10)
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 10)
+        self.assertIsNone(cache.get('b'))
+
+    def test_zero_maxsize_disables(self):
+        cache = LRUCache(0)
+        cache.set('a', 1)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get('a', 'missing'), 'missing')
+
+    def test_clear_evicts_everything(self):
+        evicted = []
+        cache = LRUCache(3, on_evict=lambda key, value: evicted.append((key, value)))
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.clear()
+        self.assertEqual(evicted, [('a', 1), ('b', 2)])
+        self.assertEqual(len(cache), 0)
+
+    def test_pop_doesnt_evict(self):
+        evicted = []
+        cache = LRUCache(3, on_evict=lambda key, value: evicted.append(key))
+        cache.set('a', 1)
+        self.assertEqual(cache.pop('a'), 1)
+        self.assertIsNone(cache.pop('a'))
+        self.assertEqual(evicted, [])
+
+    def test_stats(self):
+        cache = LRUCache(1)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+        cache.set('b', 2)
+        self.assertEqual(cache.stats(), {
+            'size': 1, 'maxsize': 1, 'hits': 1, 'misses': 1, 'evictions': 1,
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+bulk_create(ignore_conflicts=True), bulk_upsert() and the NULL handling of
+unique constraints they rely on. Needs a DBMaker server, see Tests in README.rst.
+"""
+import unittest
+from unittest import mock
+
+from helpers import CONFIGURED, requires_server, setup
+
+if CONFIGURED:
+    setup()
+
+    from django.db import IntegrityError, connection, models, transaction
+
+    from django_dbmaker.compiler import SQLInsertCompiler
+    from django_dbmaker.upsert import bulk_upsert
+
+    class UniqueRow(models.Model):
+        code = models.CharField(max_length=10, null=True, unique=True)
+
+        class Meta:
+            app_label = 'django_dbmaker'
+            db_table = 'dbmaker_test_unique_row'
+
+    class UpsertRow(models.Model):
+        code = models.CharField(max_length=10, unique=True)
+        value = models.IntegerField(default=0)
+
+        class Meta:
+            app_label = 'django_dbmaker'
+            db_table = 'dbmaker_test_upsert_row'
+
+
+@requires_server
+class ConflictTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(UniqueRow)
+
+    @classmethod
+    def tearDownClass(cls):
+        with connection.schema_editor() as editor:
+            editor.delete_model(UniqueRow)
+        connection.close()
+
+    def setUp(self):
+        UniqueRow.objects.all().delete()
+
+    def test_unique_nulls_match_feature(self):
+        UniqueRow.objects.create(code=None)
+        if connection.features.ignores_nulls_in_unique_constraints:
+            UniqueRow.objects.create(code=None)
+            self.assertEqual(UniqueRow.objects.filter(code=None).count(), 2)
+        else:
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                UniqueRow.objects.create(code=None)
+
+    def test_ignore_conflicts_skips_existing_rows(self):
+        UniqueRow.objects.create(code='a')
+        UniqueRow.objects.bulk_create(
+            [UniqueRow(code='a'), UniqueRow(code='b'), UniqueRow(code='b')],
+            ignore_conflicts=True)
+        self.assertEqual(
+            sorted(UniqueRow.objects.values_list('code', flat=True)), ['a', 'b'])
+
+    def test_ignore_conflicts_null(self):
+        UniqueRow.objects.create(code=None)
+        UniqueRow.objects.bulk_create([UniqueRow(code=None)], ignore_conflicts=True)
+        expected = 2 if connection.features.ignores_nulls_in_unique_constraints else 1
+        self.assertEqual(UniqueRow.objects.filter(code=None).count(), expected)
+
+
+@requires_server
+class UpsertTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(UpsertRow)
+
+    @classmethod
+    def tearDownClass(cls):
+        with connection.schema_editor() as editor:
+            editor.delete_model(UpsertRow)
+        connection.close()
+
+    def setUp(self):
+        UpsertRow.objects.all().delete()
+
+    def values(self):
+        return dict(UpsertRow.objects.values_list('code', 'value'))
+
+    def test_updates_matching_rows(self):
+        row = UpsertRow.objects.create(code='a', value=1)
+        bulk_upsert(UpsertRow.objects, [UpsertRow(code='a', value=2)],
+                    unique_fields=['code'], update_fields=['value'])
+        self.assertEqual(self.values(), {'a': 2})
+        self.assertEqual(UpsertRow.objects.get().pk, row.pk)
+
+    def test_inserts_other_objects(self):
+        UpsertRow.objects.create(code='a', value=1)
+        bulk_upsert(UpsertRow.objects, [UpsertRow(code='b', value=2), UpsertRow(code='c', value=3)],
+                    unique_fields=['code'], update_fields=['value'])
+        self.assertEqual(self.values(), {'a': 1, 'b': 2, 'c': 3})
+
+    def test_conflict_replays_rows(self):
+        UpsertRow.objects.create(code='a', value=1)
+        execute_group = SQLInsertCompiler.execute_group
+        raised = []
+
+        def racing_execute_group(compiler, cursor, sql, param_rows):
+            if sql.startswith('UPDATE'):
+                execute_group(compiler, cursor, sql, param_rows)
+                # Inserted by another transaction after the UPDATEs ran...
+                UpsertRow.objects.create(code='b', value=0)
+            elif not raised:
+                # ... and after the INSERTs checked for it.
+                raised.append(sql)
+                raise IntegrityError('23000', 'unique constraint violated')
+            else:
+                execute_group(compiler, cursor, sql, param_rows)
+
+        objs = [UpsertRow(code='a', value=2), UpsertRow(code='b', value=3), UpsertRow(code='c', value=4)]
+        with mock.patch.object(SQLInsertCompiler, 'execute_group', racing_execute_group):
+            bulk_upsert(UpsertRow.objects, objs, unique_fields=['code'], update_fields=['value'])
+        self.assertTrue(raised)
+        self.assertEqual(self.values(), {'a': 2, 'b': 3, 'c': 4})
+
+
+if __name__ == '__main__':
+    unittest.main()
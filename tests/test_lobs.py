@@ -0,0 +1,26 @@
+"""Slicing of the values written by lobs.write_lob()."""
+import unittest
+
+from django_dbmaker.lobs import _slices
+
+
+class SlicesTests(unittest.TestCase):
+
+    def test_appends_double_up_to_max(self):
+        slices = list(_slices([b'x' * 10] * 40, 10, 80))
+        self.assertEqual([len(s) for s in slices], [10, 10, 20, 40, 80, 80, 80, 80])
+        self.assertEqual(b''.join(slices), b'x' * 400)
+
+    def test_keeps_chunk_boundaries_and_remainder(self):
+        slices = list(_slices([b'abc', b'def', b'g'], 4, 100))
+        self.assertEqual(slices, [b'abcdef', b'g'])
+
+    def test_text(self):
+        self.assertEqual(list(_slices(['ab', 'cd', 'e'], 2, 2)), ['ab', 'cd', 'e'])
+
+    def test_empty(self):
+        self.assertEqual(list(_slices([], 10, 100)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""LatencyHistogram, the latency statistics observer."""
+import unittest
+
+from django_dbmaker.monitoring import LatencyHistogram, QueryEvent
+
+
+def event(fingerprint, seconds, rowcount=1, error=None):
+    return QueryEvent('default', fingerprint, 'SELECT %s' % fingerprint,
+                      execute_time=seconds, rowcount=rowcount, error=error)
+
+
+class LatencyHistogramTests(unittest.TestCase):
+
+    def test_counts_per_bucket(self):
+        histogram = LatencyHistogram()
+        for seconds in (0.0001, 0.003, 0.003, 2.0):
+            histogram(event('a', seconds))
+        stats = histogram.snapshot()['a']
+        self.assertEqual(stats['count'], 4)
+        self.assertEqual(stats['rows'], 4)
+        self.assertEqual(stats['max'], 2.0)
+        self.assertEqual(stats['counts'][0], 1)
+        self.assertEqual(stats['counts'][LatencyHistogram.buckets.index(0.005)], 2)
+        self.assertEqual(stats['counts'][LatencyHistogram.buckets.index(2.5)], 1)
+
+    def test_errors_and_negative_rowcounts(self):
+        histogram = LatencyHistogram()
+        histogram(event('a', 0.01, rowcount=-1, error=ValueError))
+        stats = histogram.snapshot()['a']
+        self.assertEqual((stats['errors'], stats['rows']), (1, 0))
+
+    def test_percentile(self):
+        histogram = LatencyHistogram()
+        for seconds in [0.0002] * 9 + [0.3]:
+            histogram(event('a', seconds))
+        self.assertEqual(histogram.percentile('a', 0.5), 0.0005)
+        # Bounded by the slowest statement seen.
+        self.assertEqual(histogram.percentile('a', 1.0), 0.3)
+        self.assertIsNone(histogram.percentile('b', 0.5))
+
+    def test_fingerprints_beyond_max_count_as_other(self):
+        histogram = LatencyHistogram(max_fingerprints=1)
+        histogram(event('a', 0.001))
+        histogram(event('b', 0.001))
+        histogram(event('c', 0.001))
+        snapshot = histogram.snapshot()
+        self.assertEqual(sorted(snapshot), ['a', 'other'])
+        self.assertEqual(snapshot['other']['count'], 2)
+        self.assertIsNone(snapshot['other']['sql'])
+
+    def test_snapshot_is_a_copy(self):
+        histogram = LatencyHistogram()
+        histogram(event('a', 0.001))
+        snapshot = histogram.snapshot()
+        histogram(event('a', 0.001))
+        self.assertEqual(snapshot['a']['count'], 1)
+        histogram.reset()
+        self.assertEqual(histogram.snapshot(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Parameter typing and batching of DatabaseOperations. Loads the backend, but
+needs no server.
+"""
+import unittest
+from decimal import Decimal
+
+from helpers import pyodbc, requires_driver, setup
+
+if pyodbc is not None:
+    setup()
+
+    from django.db import connection, models
+
+
+@requires_driver
+class CastParamTypeTests(unittest.TestCase):
+
+    def test_value_types(self):
+        ops = connection.ops
+        self.assertEqual(ops.cast_param_type(True), 'INT')
+        self.assertEqual(ops.cast_param_type(1), 'BIGINT')
+        self.assertEqual(ops.cast_param_type(1.5), 'DOUBLE')
+        self.assertEqual(ops.cast_param_type(b'x'), 'BLOB')
+        self.assertIsNone(ops.cast_param_type(None))
+        self.assertIsNone(ops.cast_param_type(object()))
+
+    def test_strings_sized_from_the_value(self):
+        ops = connection.ops
+        self.assertEqual(ops.cast_param_type('a' * ops.cast_char_param_max_length), ops.cast_char_param)
+        self.assertEqual(ops.cast_param_type('a' * (ops.cast_char_param_max_length + 1)),
+                         ops.cast_long_char_param)
+
+    def test_decimals(self):
+        ops = connection.ops
+        self.assertEqual(ops.cast_param_type(Decimal('123.45')), 'DECIMAL(5, 2)')
+        self.assertEqual(ops.cast_param_type(Decimal('1E+3')), 'DECIMAL(4, 0)')
+        self.assertEqual(ops.cast_param_type(Decimal('0.001')), 'DECIMAL(3, 3)')
+        for value in ('NaN', 'Infinity', '-Infinity'):
+            with self.assertRaises(ValueError):
+                ops.cast_param_type(Decimal(value))
+
+    def test_output_fields(self):
+        ops = connection.ops
+        self.assertEqual(ops.cast_param_type('a', models.TextField()), 'nclob')
+        self.assertEqual(ops.cast_param_type('a', models.IntegerField()), 'int')
+        # Unsized: typed from the value rather than cut short.
+        self.assertEqual(ops.cast_param_type('a' * 300, models.CharField()), ops.cast_char_param)
+
+
+@requires_driver
+class InputSizeTests(unittest.TestCase):
+
+    def test_sized_types(self):
+        Database = connection.Database
+        ops = connection.ops
+        self.assertEqual(ops.input_size(models.CharField(max_length=10)), (Database.SQL_WVARCHAR, 10, 0))
+        self.assertEqual(ops.input_size(models.DecimalField(max_digits=7, decimal_places=2)),
+                         (Database.SQL_DECIMAL, 7, 2))
+        self.assertEqual(ops.input_size(models.IntegerField()), (Database.SQL_INTEGER, 0, 0))
+        self.assertEqual(ops.input_size(models.DateTimeField()), (Database.SQL_TYPE_TIMESTAMP, 26, 6))
+
+    def test_unknown_sizes(self):
+        ops = connection.ops
+        self.assertIsNone(ops.input_size(None))
+        self.assertIsNone(ops.input_size(models.CharField()))
+        self.assertIsNone(ops.input_size(models.TextField()))
+        self.assertIsNone(ops.input_size(models.BinaryField()))
+
+
+@requires_driver
+class BulkBatchSizeTests(unittest.TestCase):
+
+    def test_bounded_by_params(self):
+        fields = [models.IntegerField(name='f%d' % i) for i in range(4)]
+        for field in fields:
+            field.column = field.name
+        max_rows = connection.features.max_query_params // len(fields)
+        self.assertEqual(connection.ops.bulk_batch_size(fields, range(10 ** 5)), max_rows)
+        self.assertEqual(connection.ops.bulk_batch_size(fields, range(3)), 3)
+
+    def test_bounded_by_statement_length(self):
+        field = models.IntegerField(name='value')
+        field.column = 'value'
+        size = connection.ops.bulk_batch_size([field], range(10 ** 5))
+        self.assertLessEqual(size, connection.features.max_query_params)
+        self.assertLessEqual(size * 5, connection.features.max_statement_length)
+
+    def test_at_least_one(self):
+        self.assertEqual(connection.ops.bulk_batch_size([], []), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+ConnectionPool over stand-in connections. Loads the backend, but needs no
+server.
+"""
+import threading
+import unittest
+
+from helpers import pyodbc, requires_driver, setup
+
+if pyodbc is not None:
+    setup()
+
+    from django_dbmaker.base import Database
+    from django_dbmaker.pool import ConnectionPool, PoolTimeout
+
+
+class Cursor(object):
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise Database.OperationalError('08S01', '[08S01] communication link failure')
+
+    def close(self):
+        pass
+
+
+class Connection(object):
+    def __init__(self):
+        self.autocommit = False
+        self.broken = False
+        self.closed = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return Cursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@requires_driver
+class ConnectionPoolTests(unittest.TestCase):
+
+    def make_pool(self, **options):
+        self.opened = []
+
+        def connect():
+            connection = Connection()
+            self.opened.append(connection)
+            return connection
+
+        options.setdefault('idle_timeout', None)
+        pool = ConnectionPool(connect, **options)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_reuses_released_connections(self):
+        pool = self.make_pool(max=2)
+        connection = pool.acquire()
+        pool.release(connection)
+        self.assertIs(pool.acquire(), connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_prewarm(self):
+        pool = self.make_pool(min=2, max=3)
+        pool.prewarm()
+        self.assertEqual(pool.stats(), {'size': 2, 'idle': 2, 'in_use': 0, 'max': 3})
+
+    def test_times_out_when_exhausted(self):
+        pool = self.make_pool(max=1, timeout=0.01)
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+    def test_waits_for_a_release(self):
+        pool = self.make_pool(max=1, timeout=5)
+        connection = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, [connection])
+        timer.start()
+        self.addCleanup(timer.cancel)
+        self.assertIs(pool.acquire(), connection)
+
+    def test_replaces_dead_connections(self):
+        pool = self.make_pool(max=1)
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.broken = True
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_discard_and_max_lifetime(self):
+        pool = self.make_pool(max=2, max_lifetime=0)
+        connection = pool.acquire()
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        pool = self.make_pool(max=2)
+        connection = pool.acquire()
+        pool.release(connection, discard=True)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_reap_keeps_min(self):
+        pool = self.make_pool(min=1, max=3, idle_timeout=0)
+        connections = [pool.acquire() for i in range(3)]
+        for connection in connections:
+            pool.release(connection)
+        pool.reap()
+        self.assertEqual(pool.stats()['size'], 1)
+        self.assertEqual(sum(connection.closed for connection in connections), 2)
+
+    def test_foreign_connections_arent_pooled(self):
+        pool = self.make_pool(max=1)
+        foreign = Connection()
+        pool.release(foreign)
+        self.assertFalse(foreign.closed)
+        self.assertEqual(pool.stats()['idle'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
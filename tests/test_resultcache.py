@@ -0,0 +1,40 @@
+"""
+Table extraction of the result cache. Loads the backend, but needs no
+server.
+"""
+import unittest
+
+from helpers import pyodbc, requires_driver, setup
+
+if pyodbc is not None:
+    setup()
+
+    from django_dbmaker.resultcache import referenced_tables, writes
+
+
+@requires_driver
+class ReferencedTablesTests(unittest.TestCase):
+
+    def test_select(self):
+        self.assertEqual(
+            referenced_tables('SELECT "a"."id" FROM "app_a" "a" INNER JOIN "app_b" ON ("a"."b_id" = "app_b"."id")'),
+            {'app_a', 'app_b'})
+
+    def test_from_list_and_schema(self):
+        self.assertEqual(referenced_tables('SELECT * FROM app_a a, SYSADM.app_b AS b'), {'app_a', 'app_b'})
+
+    def test_subquery(self):
+        self.assertEqual(
+            referenced_tables('SELECT id FROM app_a WHERE id IN (SELECT a_id FROM app_c)'),
+            {'app_a', 'app_c'})
+
+    def test_writes(self):
+        self.assertEqual(referenced_tables('INSERT INTO "app_a" ("x") VALUES (?)'), {'app_a'})
+        self.assertEqual(referenced_tables('UPDATE app_a SET x = 1'), {'app_a'})
+        self.assertEqual(referenced_tables('DELETE FROM app_a WHERE x = 1'), {'app_a'})
+        self.assertTrue(writes('UPDATE app_a SET x = 1'))
+        self.assertFalse(writes('SELECT x FROM app_a FOR UPDATE'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Detection of transient errors, and their retries."""
+import unittest
+
+from django_dbmaker.retry import RetryPolicy, is_transient
+
+
+class Error(Exception):
+    pass
+
+
+class IsTransientTests(unittest.TestCase):
+
+    def test_serialization_failure(self):
+        self.assertTrue(is_transient(Error('40001', '[40001] serialization failure')))
+
+    def test_deadlock_and_lock_timeout_messages(self):
+        self.assertTrue(is_transient(Error('HY000', '[HY000] (-2001) deadlock detected')))
+        self.assertTrue(is_transient(Error('HY000', '[HY000] Lock time-out')))
+
+    def test_other_errors(self):
+        self.assertFalse(is_transient(Error('23000', '[23000] unique key violated')))
+        self.assertFalse(is_transient(Error('no sqlstate')))
+        self.assertFalse(is_transient(Error('HY000', None)))
+
+    def test_native_codes(self):
+        error = Error('HY000', '[HY000] (-1234) resource busy')
+        self.assertFalse(is_transient(error))
+        self.assertTrue(is_transient(error, codes=frozenset([-1234])))
+
+
+class RetryPolicyTests(unittest.TestCase):
+
+    def test_retries_transient_errors(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise Error('40001', '[40001] serialization failure')
+            return 'done'
+
+        policy = RetryPolicy(attempts=3, backoff=0)
+        with self.assertLogs('django.db.backends', 'WARNING') as logs:
+            self.assertEqual(policy.run(flaky), 'done')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(logs.output), 2)
+
+    def test_gives_up_after_attempts(self):
+        calls = []
+
+        def deadlocked():
+            calls.append(1)
+            raise Error('40001', '[40001] serialization failure')
+
+        with self.assertRaises(Error), self.assertLogs('django.db.backends', 'WARNING'):
+            RetryPolicy(attempts=2, backoff=0).run(deadlocked)
+        self.assertEqual(len(calls), 2)
+
+    def test_other_errors_arent_retried(self):
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise Error('23000', '[23000] unique key violated')
+
+        with self.assertRaises(Error):
+            RetryPolicy(attempts=3, backoff=0).run(broken)
+        self.assertEqual(len(calls), 1)
+
+    def test_delays_are_capped(self):
+        delays = list(RetryPolicy(attempts=4, backoff=1.0, max_backoff=1.5).delays())
+        self.assertEqual(len(delays), 4)
+        self.assertIsNone(delays[-1])
+        self.assertTrue(all(0 <= delay <= 1.5 for delay in delays[:-1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Row locking of select_for_update(), checked with two workers holding
+connections of their own. Needs a DBMaker server, see Tests in README.rst.
+"""
+import threading
+import time
+import unittest
+
+from helpers import CONFIGURED, requires_server, setup
+
+if CONFIGURED:
+    setup()
+
+    from django.db import NotSupportedError, connection, connections, models, transaction
+
+    class LockedRow(models.Model):
+        value = models.IntegerField(default=0)
+
+        class Meta:
+            app_label = 'django_dbmaker'
+            db_table = 'dbmaker_test_locked_row'
+
+
+@requires_server
+class SelectForUpdateTests(unittest.TestCase):
+    # Seconds the first worker holds the lock; below DBMaker's lock timeout.
+    hold = 1.0
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(LockedRow)
+        cls.pk = LockedRow.objects.create().pk
+        cls.other_pk = LockedRow.objects.create().pk
+
+    @classmethod
+    def tearDownClass(cls):
+        with connection.schema_editor() as editor:
+            editor.delete_model(LockedRow)
+        connection.close()
+
+    def start_worker(self, target):
+        """Run ``target`` on a thread, i.e. a connection, of its own."""
+        errors = []
+
+        def run():
+            try:
+                target()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread, errors
+
+    def assertWaitsForLock(self, **kwargs):
+        locked, release = threading.Event(), threading.Event()
+        waited = []
+
+        def hold_lock():
+            with transaction.atomic():
+                list(LockedRow.objects.select_for_update(**kwargs).filter(pk=self.pk))
+                locked.set()
+                release.wait(10)
+
+        def increment():
+            start = time.monotonic()
+            with transaction.atomic():
+                row = LockedRow.objects.select_for_update(**kwargs).get(pk=self.pk)
+                waited.append(time.monotonic() - start)
+                row.value += 1
+                row.save(update_fields=['value'])
+
+        value = LockedRow.objects.get(pk=self.pk).value
+        holder, holder_errors = self.start_worker(hold_lock)
+        self.assertTrue(locked.wait(10), "The first worker didn't lock the row.")
+        waiter, waiter_errors = self.start_worker(increment)
+        time.sleep(self.hold)
+        still_waiting = waiter.is_alive()
+        release.set()
+        holder.join(10)
+        waiter.join(10)
+        self.assertEqual(holder_errors + waiter_errors, [])
+        self.assertTrue(still_waiting, "The second worker didn't wait for the lock.")
+        self.assertGreaterEqual(waited[0], self.hold)
+        self.assertEqual(LockedRow.objects.get(pk=self.pk).value, value + 1)
+
+    def test_for_update_waits(self):
+        self.assertWaitsForLock()
+
+    def test_for_update_of_waits(self):
+        self.assertWaitsForLock(of=('self',))
+
+    def test_disjoint_rows_dont_wait(self):
+        locked, release = threading.Event(), threading.Event()
+        waited = []
+
+        def hold_lock():
+            with transaction.atomic():
+                list(LockedRow.objects.select_for_update().filter(pk=self.pk))
+                locked.set()
+                release.wait(10)
+
+        def increment_other():
+            start = time.monotonic()
+            with transaction.atomic():
+                row = LockedRow.objects.select_for_update().get(pk=self.other_pk)
+                waited.append(time.monotonic() - start)
+                row.value += 1
+                row.save(update_fields=['value'])
+
+        value = LockedRow.objects.get(pk=self.other_pk).value
+        holder, holder_errors = self.start_worker(hold_lock)
+        self.assertTrue(locked.wait(10), "The first worker didn't lock its row.")
+        worker, worker_errors = self.start_worker(increment_other)
+        # Joined while the first worker still holds its lock.
+        worker.join(self.hold)
+        finished = not worker.is_alive()
+        release.set()
+        holder.join(10)
+        worker.join(10)
+        self.assertEqual(holder_errors + worker_errors, [])
+        self.assertTrue(finished, "The second worker waited for a lock on another row.")
+        self.assertLess(waited[0], self.hold)
+        self.assertEqual(LockedRow.objects.get(pk=self.other_pk).value, value + 1)
+
+    def test_nowait_not_supported(self):
+        with transaction.atomic():
+            with self.assertRaises(NotSupportedError):
+                list(LockedRow.objects.select_for_update(nowait=True).filter(pk=self.pk))
+
+
+if __name__ == '__main__':
+    unittest.main()